@@ -3,11 +3,7 @@
 # Target branch: master, stable/newton, ...
 BRANCH=stable/newton
 
-cd /opt/stack/horizon
-git checkout $BRANCH
-git remote update origin
-git merge origin/$BRANCH
-./run_tests.sh --compilemessages -N
-DJANGO_SETTINGS_MODULE=openstack_dashboard.settings python manage.py collectstatic --noinput
-DJANGO_SETTINGS_MODULE=openstack_dashboard.settings python manage.py compress --force
-sudo service apache2 reload
+# Only changed catalogs are compiled, and collectstatic and compress are
+# run only when static files changed. See horizon_reload.py --help.
+exec python $(dirname $0)/horizon_reload.py --branch $BRANCH \
+    --horizon-dir /opt/stack/horizon "$@"
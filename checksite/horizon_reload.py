@@ -0,0 +1,273 @@
+#!/usr/bin/python
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Refresh Horizon on the translation check site.
+
+Only .po files whose content changed since the last run are compiled,
+in parallel. collectstatic and compress are run only when static files
+or templates changed. The time taken by each stage is logged.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import multiprocessing
+from multiprocessing import pool
+import os
+import subprocess
+import sys
+import time
+
+LOG = logging.getLogger('horizon-reload')
+
+# Django apps whose locale directories compilemessages compiles. The
+# catalogs of doc/ and releasenotes/ are not used by the site.
+DJANGO_DIRS = ('horizon', 'openstack_dashboard')
+# Changes to files under these directories or with these extensions
+# require collectstatic and compress to be run again.
+STATIC_DIRS = ('static', 'templates')
+STATIC_EXTENSIONS = ('.js', '.css', '.scss', '.html')
+# Directories never looked into for static files.
+STATIC_SKIP_DIRS = ('.git', '.tox', 'node_modules', 'locale')
+# The default STATIC_ROOT of Horizon, into which collectstatic and
+# compress write their output. Only skipped at the top level, since
+# horizon/static and openstack_dashboard/static hold the sources.
+STATIC_ROOT_DIR = 'static'
+
+
+def _default_state_file():
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                        os.path.join(os.path.expanduser('~'), '.cache'),
+                        'openstack-i18n', 'checksite-state.json')
+
+
+@contextlib.contextmanager
+def stage(name, timings):
+    start = time.time()
+    LOG.info('%s: started', name)
+    try:
+        yield
+    finally:
+        timings[name] = time.time() - start
+        LOG.info('%s: took %.1f seconds', name, timings[name])
+
+
+def run(command, cwd, env=None):
+    LOG.debug('Running %s', ' '.join(command))
+    subprocess.check_call(command, cwd=cwd, env=env)
+
+
+def update_source(horizon_dir, branch):
+    run(['git', 'checkout', branch], horizon_dir)
+    run(['git', 'remote', 'update', 'origin'], horizon_dir)
+    run(['git', 'merge', 'origin/%s' % branch], horizon_dir)
+
+
+def _sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def find_catalogs(horizon_dir):
+    """Return .po files of Horizon and its dashboards."""
+    catalogs = []
+    for django_dir in DJANGO_DIRS:
+        locale_dir = os.path.join(horizon_dir, django_dir, 'locale')
+        for dirpath, dirnames, filenames in os.walk(locale_dir):
+            dirnames.sort()
+            if os.path.basename(dirpath) != 'LC_MESSAGES':
+                continue
+            catalogs.extend(os.path.join(dirpath, filename)
+                            for filename in sorted(filenames)
+                            if filename.endswith('.po'))
+    return catalogs
+
+
+def changed_catalogs(catalogs, hashes):
+    """Return (po, sha1) of catalogs changed since hashes were recorded."""
+    changed = []
+    for po_path in catalogs:
+        digest = _sha1(po_path)
+        mo_path = po_path[:-3] + '.mo'
+        if hashes.get(po_path) != digest or not os.path.exists(mo_path):
+            changed.append((po_path, digest))
+    return changed
+
+
+def compile_catalog(po_path):
+    """Compile a .po file as django-admin compilemessages does."""
+    mo_path = po_path[:-3] + '.mo'
+    proc = subprocess.Popen(['msgfmt', '--check-format', '-o', mo_path,
+                             po_path],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = proc.communicate()[0]
+    return po_path, proc.returncode, output.decode('utf-8', 'replace')
+
+
+def compile_catalogs(changed, hashes, jobs):
+    """Compile changed catalogs with parallel msgfmt processes.
+
+    Hashes of successfully compiled catalogs are recorded. Returns the
+    number of failures.
+    """
+    if not changed:
+        return 0
+    digests = dict(changed)
+    workers = pool.ThreadPool(min(len(changed), jobs))
+    failures = 0
+    try:
+        for po_path, returncode, output in workers.imap_unordered(
+                compile_catalog, [po_path for po_path, digest in changed]):
+            if returncode:
+                failures += 1
+                LOG.error('Failed to compile %s:\n%s', po_path, output)
+            else:
+                hashes[po_path] = digests[po_path]
+                LOG.debug('Compiled %s', po_path)
+    finally:
+        workers.close()
+        workers.join()
+    LOG.info('Compiled %d of %d changed catalogs',
+             len(changed) - failures, len(changed))
+    return failures
+
+
+def static_fingerprint(horizon_dir):
+    """Return a hash of paths, sizes and mtimes of static files.
+
+    The output of collectstatic and compress in STATIC_ROOT_DIR is left
+    out, so that running them does not change the fingerprint.
+    """
+    h = hashlib.sha1()
+    for dirpath, dirnames, filenames in os.walk(horizon_dir):
+        dirnames[:] = sorted(d for d in dirnames
+                             if d not in STATIC_SKIP_DIRS and
+                             not (dirpath == horizon_dir and
+                                  d == STATIC_ROOT_DIR))
+        in_static_dir = any(part in STATIC_DIRS for part in
+                            os.path.relpath(dirpath, horizon_dir)
+                            .split(os.sep))
+        for filename in sorted(filenames):
+            if not (in_static_dir or filename.endswith(STATIC_EXTENSIONS)):
+                continue
+            path = os.path.join(dirpath, filename)
+            st = os.stat(path)
+            h.update(('%s %d %r\n' % (os.path.relpath(path, horizon_dir),
+                                      st.st_size, st.st_mtime))
+                     .encode('utf-8'))
+    return h.hexdigest()
+
+
+def _git_head(horizon_dir):
+    return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                   cwd=horizon_dir).decode('utf-8').strip()
+
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(path, state):
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+
+
+def main(options):
+    horizon_dir = options.horizon_dir
+    state = load_state(options.state_file)
+    hashes = state.setdefault('catalogs', {})
+    timings = {}
+    env = dict(os.environ,
+               DJANGO_SETTINGS_MODULE='openstack_dashboard.settings')
+
+    if not options.no_update:
+        with stage('update', timings):
+            update_source(horizon_dir, options.branch)
+    head = _git_head(horizon_dir)
+    code_changed = state.get('head') != head
+
+    with stage('compilemessages', timings):
+        changed = changed_catalogs(find_catalogs(horizon_dir), hashes)
+        failures = compile_catalogs(changed, hashes, options.jobs)
+
+    with stage('detect static changes', timings):
+        fingerprint = static_fingerprint(horizon_dir)
+        static_changed = (options.force_static or
+                          state.get('static') != fingerprint)
+    if static_changed:
+        with stage('collectstatic', timings):
+            run([sys.executable, 'manage.py', 'collectstatic', '--noinput'],
+                horizon_dir, env)
+        with stage('compress', timings):
+            run([sys.executable, 'manage.py', 'compress', '--force'],
+                horizon_dir, env)
+        state['static'] = fingerprint
+    else:
+        LOG.info('No static files changed. Skipping collectstatic and '
+                 'compress.')
+
+    if code_changed or changed or static_changed:
+        with stage('reload', timings):
+            run(options.reload_command.split(), horizon_dir)
+    else:
+        LOG.info('Nothing changed. Skipping reload.')
+
+    state['head'] = head
+    save_state(options.state_file, state)
+    LOG.info('Done in %.1f seconds (%s)', sum(timings.values()),
+             ', '.join('%s %.1fs' % item for item in
+                       sorted(timings.items(), key=lambda item: -item[1])))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--branch', default='stable/newton',
+                        help='Target branch. Default: stable/newton')
+    parser.add_argument('--horizon-dir', default='/opt/stack/horizon',
+                        help='Horizon directory. Default: /opt/stack/horizon')
+    parser.add_argument('--state-file', default=_default_state_file(),
+                        help='File recording catalog hashes and the '
+                             'static files state. Default: %(default)s')
+    parser.add_argument('--no-update', action='store_true',
+                        help='Do not pull the branch before refreshing.')
+    parser.add_argument('--force-static', action='store_true',
+                        help='Run collectstatic and compress even if no '
+                             'static files changed, e.g. after updating '
+                             'xstatic packages.')
+    parser.add_argument('--reload-command',
+                        default='sudo service apache2 reload',
+                        help='Command to reload the web server. '
+                             'Default: %(default)s')
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of parallel msgfmt processes. '
+                             'Default: number of CPUs')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Log each command and compiled catalog.')
+    options = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if options.verbose
+                        else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+    sys.exit(main(options))
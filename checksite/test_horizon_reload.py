@@ -0,0 +1,85 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of the incremental refresh of horizon_reload.py."""
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import horizon_reload
+
+# Stands in for Horizon's manage.py: records each command, and writes
+# into STATIC_ROOT like collectstatic and compress do.
+MANAGE_PY = '''import os
+import sys
+import time
+
+with open('commands.log', 'a') as f:
+    f.write(sys.argv[1] + '\\n')
+if not os.path.isdir('static'):
+    os.makedirs('static')
+with open(os.path.join('static', sys.argv[1] + '.js'), 'w') as f:
+    f.write(str(time.time()))
+'''
+
+
+class RefreshTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.horizon_dir = os.path.join(self.tmpdir, 'horizon')
+        static_dir = os.path.join(self.horizon_dir, 'horizon', 'static')
+        os.makedirs(static_dir)
+        with open(os.path.join(static_dir, 'horizon.js'), 'w') as f:
+            f.write('var horizon;\n')
+        with open(os.path.join(self.horizon_dir, 'manage.py'), 'w') as f:
+            f.write(MANAGE_PY)
+        git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@test']
+        for command in (['init', '-q'], ['add', '.'],
+                        ['commit', '-q', '-m', 'init']):
+            subprocess.check_call(git + command, cwd=self.horizon_dir)
+        self.options = argparse.Namespace(
+            horizon_dir=self.horizon_dir,
+            state_file=os.path.join(self.tmpdir, 'state.json'),
+            no_update=True, branch='master', force_static=False,
+            reload_command='true', jobs=1)
+
+    def commands(self):
+        path = os.path.join(self.horizon_dir, 'commands.log')
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return f.read().split()
+
+    def test_second_run_skips_static(self):
+        self.assertEqual(0, horizon_reload.main(self.options))
+        self.assertEqual(['collectstatic', 'compress'], self.commands())
+        self.assertEqual(0, horizon_reload.main(self.options))
+        self.assertEqual(['collectstatic', 'compress'], self.commands())
+
+    def test_changed_source_runs_static(self):
+        horizon_reload.main(self.options)
+        with open(os.path.join(self.horizon_dir, 'horizon', 'static',
+                               'horizon.js'), 'a') as f:
+            f.write('var dashboard;\n')
+        horizon_reload.main(self.options)
+        self.assertEqual(['collectstatic', 'compress'] * 2, self.commands())
+
+
+if __name__ == '__main__':
+    unittest.main()
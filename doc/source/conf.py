@@ -20,6 +20,7 @@
 # All configuration values have a default; values that are commented out
 # serve to show the default.
 
+import os
 import subprocess
 # import sys
 
@@ -75,9 +76,17 @@ release = '1.0.0'
 #   bug_tag: Tag for categorizing the bug. Must be set manually.
 # These variables are passed to the logabug code via html_context.
 giturl = u'https://git.openstack.org/cgit/openstack/i18n/tree/doc/source'
-git_cmd = ["/usr/bin/git", "rev-parse", "HEAD"]
-gitsha = subprocess.Popen(
-    git_cmd, stdout=subprocess.PIPE).communicate()[0].strip('\n')
+# A build driver building several languages (tools/build_docs.py) passes
+# the SHA in I18N_DOCS_GITSHA, so that git is not run by every build.
+gitsha = os.environ.get('I18N_DOCS_GITSHA')
+if not gitsha:
+    try:
+        gitsha = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        gitsha = u'unknown'
 html_context = {"gitsha": gitsha, "bug_tag": bug_tag,
                 "giturl": giturl}
 
@@ -0,0 +1,163 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Entry point of the I18n tools.
+
+Each subcommand runs one of the scripts under tools/ as if it were run
+directly. Only the script of the given subcommand is loaded, so a quick
+check does not import the dependencies of the Zanata tools.
+
+The scripts are found in tools/ of the source tree, or under
+share/openstacki18n/tools of the installation prefix or of the user
+base of pip install --user, where they are installed as data files.
+"""
+
+import os
+import sys
+import time
+
+_start = time.time()
+
+# Installation directory of the scripts relative to a prefix.
+DATA_DIR = os.path.join('share', 'openstacki18n', 'tools')
+TOOLS_DIRS = [
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 'tools'),
+    os.path.join(sys.prefix, DATA_DIR),
+]
+
+# Subcommand: (script relative to tools/, description)
+COMMANDS = {
+    'build-docs': ('build_docs.py',
+                   'Build the docs in all languages in parallel.'),
+    'check-catalogs': ('check_catalogs.py',
+                       'Check PO/POT catalogs like msgfmt --check-format.'),
+    'check-consistency': ('check_consistency.py',
+                          'Find msgids translated differently across '
+                          'catalogs.'),
+    'check-yaml': ('check_yaml_file.py',
+                   'Validate a translation team YAML file.'),
+    'cube': ('zanata/zanata_cube.py',
+             'Show rollups of a stats cube saved by stats.'),
+    'fake-zanata': ('zanata/fake_zanata.py',
+                    'Serve an offline stand-in for Zanata.'),
+    'progress': ('translation_stats.py',
+                 'Show translation progress of local catalogs.'),
+    'stats': ('zanata/zanata_stats.py',
+              'Collect translator stats from Zanata.'),
+    'stats-benchmark': ('zanata/benchmark.py',
+                        'Benchmark stats and users against fake Zanata.'),
+    'tm': ('translation_memory.py',
+           'Look up translations of a term across catalogs.'),
+    'users': ('zanata/zanata_users.py',
+              'Collect language team members from Zanata.'),
+}
+
+
+def _process_age():
+    """Return seconds since the process started, if known.
+
+    It includes the interpreter startup, which time.time() at import
+    does not. The resolution is a clock tick (usually 10 ms).
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name, starting with the 3rd one.
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - float(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _usage():
+    width = max(len(name) for name in COMMANDS)
+    lines = ['usage: i18n-tools [--timing] <command> [<args>]', '',
+             'commands:']
+    lines += ['  %s  %s' % (name.ljust(width), COMMANDS[name][1])
+              for name in sorted(COMMANDS)]
+    lines += ['', "Run 'i18n-tools <command> -h' for the options of a "
+              "command.", '--timing reports the startup time and the run '
+              'time of the command on standard error.']
+    return '\n'.join(lines)
+
+
+def _tools_dirs():
+    tools_dirs = list(TOOLS_DIRS)
+    # site is already imported at startup unless python runs with -S.
+    import site
+    user_base = getattr(site, 'USER_BASE', None)
+    if user_base:
+        tools_dirs.append(os.path.join(user_base, DATA_DIR))
+    return tools_dirs
+
+
+def _tools_dir(name):
+    """Return the directory which has the script of a subcommand.
+
+    In an installed tree, the directory next to the package is
+    site-packages/tools, which may belong to another distribution, so
+    a directory is only used if it has the script.
+    """
+    tools_dirs = _tools_dirs()
+    for tools_dir in tools_dirs:
+        if os.path.isfile(os.path.join(tools_dir, COMMANDS[name][0])):
+            return tools_dir
+    raise RuntimeError('%s is not found in %s'
+                       % (COMMANDS[name][0], ', '.join(tools_dirs)))
+
+
+def run_command(name, args):
+    """Run the script of a subcommand with the given arguments."""
+    # Imported here to keep the startup of the dispatcher minimal.
+    import runpy
+
+    script = os.path.join(_tools_dir(name), COMMANDS[name][0])
+    # Scripts import modules next to them by their plain names.
+    sys.path.insert(0, os.path.dirname(script))
+    sys.argv = [script] + list(args)
+    runpy.run_path(script, run_name='__main__')
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    timing = '--timing' in argv[:1]
+    if timing:
+        argv.pop(0)
+    if not argv or argv[0] in ('-h', '--help'):
+        print(_usage())
+        return 0
+    name = argv[0]
+    if name not in COMMANDS:
+        sys.stderr.write('i18n-tools: unknown command "%s"\n\n%s\n'
+                         % (name, _usage()))
+        return 2
+
+    started = time.time()
+    if timing:
+        age = _process_age()
+        if age is None:
+            age = started - _start
+        sys.stderr.write('i18n-tools: started in %.0f ms\n' % (age * 1000))
+    try:
+        run_command(name, argv[1:])
+    finally:
+        if timing:
+            sys.stderr.write('i18n-tools: %s took %.1f ms\n'
+                             % (name, (time.time() - started) * 1000))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Build the documentation in the source language and in translations.
+
+Translations of the documentation are read from Sphinx catalogs under
+doc/source/locale/<lang>/LC_MESSAGES, one per document domain (index.po,
+glossary.po, ...). Templates for them are generated with --pot. The
+catalogs under i18n/locale translate the glossary terms, not the
+documents, and Sphinx never loads them.
+
+.mo catalogs are compiled only from .po files which changed since the
+last run, languages are built in parallel, and each language keeps its
+own Sphinx doctrees so that Sphinx rebuilds only outdated pages. A
+language whose sources and catalogs did not change is not built at all.
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+from multiprocessing import pool
+import os
+import subprocess
+import sys
+import time
+
+from babel.messages import mofile
+from babel.messages import pofile
+
+import translation_stats
+
+TOP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+STAMP_FILE = '.build-stamps.json'
+SOURCE_SUFFIX = '.rst'
+
+
+def _sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def compile_catalog(args):
+    """Compile a .po file into a .mo file."""
+    po_path, mo_path = args
+    with open(po_path, 'rb') as f:
+        catalog = pofile.read_po(f)
+    dirname = os.path.dirname(mo_path)
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # Another worker created it.
+            pass
+    with open(mo_path, 'wb') as f:
+        mofile.write_mo(f, catalog)
+    return mo_path
+
+
+def doc_domains(source_dir):
+    """Return the gettext domains of the documents under source_dir.
+
+    With the default gettext_compact, Sphinx looks up the messages of a
+    document in the catalog named after its top-level directory, or
+    after the document itself if it is at the top.
+    """
+    domains = set()
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        for filename in filenames:
+            if filename.endswith(SOURCE_SUFFIX):
+                docname = os.path.relpath(
+                    os.path.join(dirpath, filename[:-len(SOURCE_SUFFIX)]),
+                    source_dir)
+                domains.add(docname.split(os.sep)[0])
+    return domains
+
+
+def find_doc_catalogs(locale_dir, source_dir):
+    """Yield (language, domain, path) of catalogs of the documents.
+
+    Catalogs not named after a document domain are never loaded by
+    Sphinx, so they are reported and skipped.
+    """
+    domains = doc_domains(source_dir)
+    for language, domain, po_path in translation_stats.find_catalogs(
+            locale_dir):
+        if domain in domains:
+            yield language, domain, po_path
+        else:
+            print('%s: no document for domain "%s", skipped'
+                  % (po_path, domain))
+
+
+def compile_catalogs(catalogs, mo_dir, languages, stamps, jobs):
+    """Compile .po files of the languages whose content changed.
+
+    catalogs is a list of (language, domain, path of .po). Returns a
+    dict from a language to the list of (domain, SHA-1 of .po) of its
+    catalogs.
+    """
+    digests = {}
+    work = []
+    for language, domain, po_path in catalogs:
+        if language not in languages:
+            continue
+        mo_path = os.path.join(mo_dir, language, 'LC_MESSAGES',
+                               '%s.mo' % domain)
+        digest = _sha1(po_path)
+        digests.setdefault(language, []).append((domain, digest))
+        if stamps.get(mo_path) != digest or not os.path.exists(mo_path):
+            work.append((po_path, mo_path))
+            stamps[mo_path] = digest
+    if len(work) > 1 and jobs != 1:
+        workers = multiprocessing.Pool(jobs or None)
+        try:
+            workers.map(compile_catalog, work)
+        finally:
+            workers.close()
+            workers.join()
+    else:
+        for args in work:
+            compile_catalog(args)
+    for po_path, mo_path in work:
+        print('compiled %s' % mo_path)
+    return digests
+
+
+def source_fingerprint(source_dir, exclude=()):
+    """Return a hash of the paths, sizes and mtimes of all sources.
+
+    Directories in exclude, such as the catalogs which are hashed per
+    language or a build directory inside the sources, are skipped.
+    """
+    exclude = set(os.path.abspath(path) for path in exclude)
+    h = hashlib.sha1()
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if os.path.abspath(os.path.join(dirpath, d)) not in exclude)
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            st = os.stat(path)
+            h.update(('%s %d %r\n' % (os.path.relpath(path, source_dir),
+                                      st.st_size, st.st_mtime))
+                     .encode('utf-8'))
+    return h.hexdigest()
+
+
+def _git_sha():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=TOP_DIR).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def build_language(args):
+    """Run sphinx-build for a language (None for the source language).
+
+    Returns (language, returncode, elapsed seconds, output).
+    """
+    language, command, env = args
+    start = time.time()
+    proc = subprocess.Popen(command, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+    output = proc.communicate()[0].decode('utf-8', 'replace')
+    return language, proc.returncode, time.time() - start, output
+
+
+def _build_command(parsed_args, language, mo_dir):
+    if language:
+        html_dir = os.path.join(parsed_args.build_dir, language, 'html')
+        doctree_dir = os.path.join(parsed_args.build_dir, language,
+                                   'doctrees')
+    else:
+        html_dir = os.path.join(parsed_args.build_dir, 'html')
+        doctree_dir = os.path.join(parsed_args.build_dir, 'doctrees')
+    command = [parsed_args.sphinx_build, '-b', 'html', '-q',
+               '-d', doctree_dir]
+    if parsed_args.warning_is_error:
+        command.append('-W')
+    if language:
+        command += ['-D', 'language=%s' % language,
+                    '-D', 'locale_dirs=%s' % os.path.abspath(mo_dir)]
+    return command + [parsed_args.source_dir, html_dir], html_dir
+
+
+def build_pot(parsed_args):
+    """Generate .pot templates of the documents with the gettext builder.
+
+    Translations are created from them as
+    <locale dir>/<lang>/LC_MESSAGES/<domain>.po.
+    """
+    pot_dir = os.path.join(parsed_args.build_dir, 'gettext')
+    returncode = subprocess.call(
+        [parsed_args.sphinx_build, '-b', 'gettext', '-q',
+         '-d', os.path.join(parsed_args.build_dir, 'doctrees-gettext'),
+         parsed_args.source_dir, pot_dir],
+        env=dict(os.environ, I18N_DOCS_GITSHA=_git_sha()))
+    if returncode == 0:
+        print('Templates have been written to %s' % pot_dir)
+    return returncode
+
+
+def main(parsed_args):
+    if parsed_args.pot:
+        return build_pot(parsed_args)
+    build_dir = parsed_args.build_dir
+    stamp_path = os.path.join(build_dir, STAMP_FILE)
+    stamps = {'catalogs': {}, 'builds': {}}
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            stamps = json.load(f)
+
+    catalogs = []
+    if os.path.isdir(parsed_args.locale_dir):
+        catalogs = list(find_doc_catalogs(parsed_args.locale_dir,
+                                          parsed_args.source_dir))
+    available = sorted(set(language for language, domain, path
+                           in catalogs))
+    languages = parsed_args.language or available
+    unknown = set(languages) - set(available)
+    if unknown:
+        print('No catalogs of the documents for: %s'
+              % ', '.join(sorted(unknown)))
+        return 1
+
+    mo_dir = os.path.join(build_dir, 'locale')
+    digests = compile_catalogs(catalogs, mo_dir, set(languages),
+                               stamps['catalogs'], parsed_args.jobs)
+
+    targets = list(languages)
+    if not parsed_args.language:
+        targets.insert(0, None)
+    sources = source_fingerprint(parsed_args.source_dir,
+                                 [parsed_args.locale_dir, build_dir])
+    env = dict(os.environ, I18N_DOCS_GITSHA=_git_sha())
+    work = []
+    fingerprints = {}
+    for language in targets:
+        command, html_dir = _build_command(parsed_args, language, mo_dir)
+        fingerprint = hashlib.sha1(json.dumps(
+            [sources, command, sorted(digests.get(language, []))])
+            .encode('utf-8')).hexdigest()
+        key = language or ''
+        if (not parsed_args.force and os.path.isdir(html_dir) and
+                stamps['builds'].get(key) == fingerprint):
+            print('%s: up to date' % (language or 'source'))
+            continue
+        fingerprints[key] = fingerprint
+        work.append((language, command, env))
+
+    failed = False
+    if work:
+        workers = pool.ThreadPool(min(len(work), parsed_args.jobs or
+                                      multiprocessing.cpu_count()))
+        try:
+            for language, returncode, elapsed, output in (
+                    workers.imap_unordered(build_language, work)):
+                key = language or ''
+                if returncode == 0:
+                    stamps['builds'][key] = fingerprints[key]
+                    print('%s: built in %.1f seconds'
+                          % (language or 'source', elapsed))
+                else:
+                    failed = True
+                    stamps['builds'].pop(key, None)
+                    print('%s: build failed' % (language or 'source'))
+                if output and (returncode or parsed_args.verbose):
+                    sys.stdout.write(output)
+        finally:
+            workers.close()
+            workers.join()
+
+    if not os.path.isdir(build_dir):
+        os.makedirs(build_dir)
+    with open(stamp_path, 'w') as f:
+        json.dump(stamps, f, indent=1, sort_keys=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-l', '--language', action='append',
+                        help='Language to build. Can be specified '
+                             'multiple times. Default: the source language '
+                             'and all languages with catalogs')
+    parser.add_argument('--source-dir',
+                        default=os.path.join(TOP_DIR, 'doc', 'source'),
+                        help='Sphinx source directory. '
+                             'Default: doc/source')
+    parser.add_argument('--build-dir',
+                        default=os.path.join(TOP_DIR, 'doc', 'build'),
+                        help='Build directory. Default: doc/build')
+    parser.add_argument('--locale-dir',
+                        default=os.path.join(TOP_DIR, 'doc', 'source',
+                                             'locale'),
+                        help='Directory of the .po catalogs of the '
+                             'documents. Default: doc/source/locale')
+    parser.add_argument('--sphinx-build', default='sphinx-build',
+                        help='sphinx-build command. Default: sphinx-build')
+    parser.add_argument('-W', dest='warning_is_error', action='store_true',
+                        help='Turn warnings into errors.')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='Number of parallel builds. '
+                             'Default: number of CPUs')
+    parser.add_argument('--force', action='store_true',
+                        help='Build languages even if nothing changed.')
+    parser.add_argument('--pot', action='store_true',
+                        help='Only generate .pot templates of the '
+                             'documents into <build dir>/gettext.')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Show the output of successful builds.')
+    parsed_args = parser.parse_args()
+
+    sys.exit(main(parsed_args))
@@ -0,0 +1,303 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Check PO/POT catalogs like msgfmt --check-format.
+
+Catalogs are checked in a process pool. A catalog whose content hash is
+unchanged since it last passed is skipped.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+
+from babel.messages import catalog as babel_catalog
+from babel.messages import pofile
+
+import po_reader
+
+BRACE_FORMAT = re.compile(r'(?<!\{)\{([^{}]*)\}(?!\})')
+NAMED_PYTHON_FORMAT = re.compile(r'%\(([^)]+)\)')
+FORMAT_FLAGS = ('python-format', 'c-format')
+# Conversions which msgfmt considers the same argument type.
+CONVERSION_TYPES = dict([(c, 'integer') for c in 'diouxX'] +
+                        [(c, 'float') for c in 'eEfFgG'] +
+                        [('c', 'character'), ('s', 'any'), ('r', 'any')])
+# Bump when checks change, so that catalogs which passed the cached
+# checks of an older version are checked again.
+CHECKER_VERSION = 3
+# abort_invalid of read_po and PoFileError are only available since
+# Babel 2.6.0. Older versions raise ValueError on some errors.
+PoFileError = getattr(pofile, 'PoFileError', None)
+# Babel silently accepts some malformed lines, e.g. unterminated strings.
+PO_LINE = re.compile(br'^\s*(?:#.*|'
+                     br'(?:(?:msgctxt|msgid|msgid_plural|msgstr(?:\[\d+\])?)'
+                     br'\s+)?"(?:[^"\\]|\\.)*"\s*)?$')
+
+
+def _default_cache_file():
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                        os.path.join(os.path.expanduser('~'), '.cache'),
+                        'openstack-i18n', 'catalog-check.json')
+
+
+def find_catalogs(paths):
+    """Return PO and POT files under the given files or directories."""
+    catalogs = []
+    for path in paths:
+        if os.path.isfile(path):
+            catalogs.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(('.po', '.pot')):
+                    catalogs.append(os.path.join(dirpath, filename))
+    return catalogs
+
+
+def _percent_placeholders(string):
+    """Return (named, positional) placeholders of a %-format string."""
+    named = {}
+    positional = []
+    for match in babel_catalog.PYTHON_FORMAT.finditer(string):
+        name, conversion = match.group(1), match.group(3)
+        if conversion == '%':
+            continue
+        format_type = CONVERSION_TYPES[conversion]
+        if name:
+            named[name] = format_type
+        else:
+            positional.append(format_type)
+    return named, positional
+
+
+def _check_percent_format(msgid, msgstr, partial):
+    id_named, id_positional = _percent_placeholders(msgid)
+    str_named, str_positional = _percent_placeholders(msgstr)
+    for name, format_type in sorted(str_named.items()):
+        if name not in id_named:
+            yield ("format specification for argument '%s' does not "
+                   "exist in msgid" % name)
+        elif id_named[name] != format_type:
+            yield ("format specifications for argument '%s' are not "
+                   "the same" % name)
+    if not partial:
+        for name in sorted(set(id_named) - set(str_named)):
+            yield ("format specification for argument '%s' does not "
+                   "exist in msgstr" % name)
+    if str_positional and str_positional != id_positional[
+            :len(str_positional)]:
+        yield "positional format specifications are not the same"
+    elif not partial and len(str_positional) != len(id_positional):
+        yield ("number of format specifications in msgid and msgstr "
+               "does not match")
+
+
+def _check_brace_format(msgid, msgstr, partial):
+    id_fields = set(BRACE_FORMAT.findall(msgid))
+    str_fields = set(BRACE_FORMAT.findall(msgstr))
+    for field in sorted(str_fields - id_fields):
+        yield "format field '{%s}' does not exist in msgid" % field
+    if not partial:
+        for field in sorted(id_fields - str_fields):
+            yield "format field '{%s}' does not exist in msgstr" % field
+
+
+def _check_named_placeholders(msgid, msgstr):
+    id_names = set(NAMED_PYTHON_FORMAT.findall(msgid))
+    str_names = set(NAMED_PYTHON_FORMAT.findall(msgstr))
+    if id_names != str_names:
+        yield ('placeholders %s in msgid do not match %s in msgstr'
+               % (sorted(id_names), sorted(str_names)))
+
+
+def check_message(message, nplurals, flags):
+    """Yield problems of a single catalog message.
+
+    flags are the flags written in the catalog. Babel adds python-format
+    and python-brace-format to any msgid which looks like a format
+    string, but msgfmt only checks the formats of flagged entries.
+    """
+    if not message.id or message.fuzzy:
+        return
+    if isinstance(message.id, (list, tuple)):
+        msgids = list(message.id)
+        msgstrs = list(message.string)
+        if any(msgstrs) and len(msgstrs) != nplurals:
+            yield ('number of plural forms (%d) does not match '
+                   'nplurals (%d)' % (len(msgstrs), nplurals))
+    else:
+        msgids = [message.id]
+        msgstrs = [message.string]
+
+    plural = len(msgids) > 1
+    for index, msgstr in enumerate(msgstrs):
+        if not msgstr:
+            continue
+        msgid = msgids[min(index, len(msgids) - 1)]
+        # A plural form may leave out the number, as msgfmt allows.
+        partial = plural
+        for edge, where in ((0, 'begin'), (-1, 'end')):
+            if (msgid[edge] == '\n') != (msgstr[edge] == '\n'):
+                yield ("'msgid' and 'msgstr' entries do not both %s "
+                       "with '\\n'" % where)
+        if any(flag in flags for flag in FORMAT_FLAGS):
+            for problem in _check_percent_format(msgid, msgstr, partial):
+                yield problem
+        elif 'python-brace-format' in flags:
+            for problem in _check_brace_format(msgid, msgstr, partial):
+                yield problem
+        else:
+            for problem in _check_named_placeholders(msgid, msgstr):
+                yield problem
+
+
+def check_syntax(data):
+    """Yield (line, message) tuples for lines which are not valid PO."""
+    for lineno, line in enumerate(data.splitlines(), 1):
+        if not PO_LINE.match(line):
+            yield lineno, 'syntax error: invalid line'
+
+
+_PARSE_ERRORS = (UnicodeDecodeError, ValueError)
+if PoFileError is not None:
+    _PARSE_ERRORS += (PoFileError,)
+
+
+def _read_po(data):
+    if PoFileError is None:
+        return pofile.read_po(io.BytesIO(data))
+    return pofile.read_po(io.BytesIO(data), abort_invalid=True)
+
+
+def check_catalog(path):
+    """Check a catalog file.
+
+    Returns a tuple of the SHA-1 of its content and a list of
+    (line, message) tuples.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    problems = list(check_syntax(data))
+    if problems:
+        return digest, problems
+    try:
+        catalog = _read_po(data)
+    except _PARSE_ERRORS as e:
+        line = getattr(e, 'lineno', 0)
+        return digest, [(line, 'syntax error: %s' % e)]
+    flags = dict(((entry.msgctxt, entry.msgid), entry.flags)
+                 for entry in po_reader.iter_entries(path))
+    for message in catalog:
+        lineno = message.lineno or 0
+        msgid = (message.id[0] if isinstance(message.id, (list, tuple))
+                 else message.id)
+        for problem in check_message(
+                message, catalog.num_plurals,
+                flags.get((message.context, msgid), frozenset())):
+            problems.append((lineno, problem))
+    return digest, problems
+
+
+class CheckCache(object):
+    """Content hashes of catalogs which passed the last check.
+
+    Hashes recorded by another CHECKER_VERSION are discarded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hashes = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except ValueError:
+                data = {}
+            if (isinstance(data, dict) and
+                    data.get('version') == CHECKER_VERSION):
+                self.hashes = data.get('hashes', {})
+
+    def is_clean(self, catalog_path):
+        digest = self.hashes.get(os.path.abspath(catalog_path))
+        if not digest:
+            return False
+        with open(catalog_path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest() == digest
+
+    def update(self, catalog_path, digest, clean):
+        key = os.path.abspath(catalog_path)
+        if clean:
+            self.hashes[key] = digest
+        else:
+            self.hashes.pop(key, None)
+
+    def save(self):
+        if not self.path:
+            return
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(self.path, 'w') as f:
+            json.dump({'version': CHECKER_VERSION, 'hashes': self.hashes},
+                      f, indent=1, sort_keys=True)
+
+
+def main(parsed_args):
+    cache = CheckCache(None if parsed_args.no_cache
+                       else parsed_args.cache_file)
+    catalogs = [path for path in find_catalogs(parsed_args.paths)
+                if not cache.is_clean(path)]
+
+    if len(catalogs) > 1 and parsed_args.jobs != 1:
+        pool = multiprocessing.Pool(parsed_args.jobs or None)
+        try:
+            results = pool.map(check_catalog, catalogs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [check_catalog(path) for path in catalogs]
+
+    failed = False
+    for path, (digest, problems) in zip(catalogs, results):
+        for line, problem in problems:
+            print('%s:%d: %s' % (path, line, problem))
+        cache.update(path, digest, not problems)
+        failed = failed or bool(problems)
+    cache.save()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='Number of worker processes. '
+                             'Default: number of CPUs')
+    parser.add_argument('--cache-file', default=_default_cache_file(),
+                        help='File to record catalogs which passed. '
+                             'Default: %(default)s')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Check all catalogs regardless of the cache.')
+    parser.add_argument('paths', nargs='+',
+                        help='PO/POT files or directories to search.')
+    parsed_args = parser.parse_args()
+
+    sys.exit(main(parsed_args))
@@ -0,0 +1,170 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Find msgids translated differently across PO catalogs.
+
+Entries are read once and partitioned into bucket files on disk by the
+hash of (language, normalized msgid). Each bucket is then grouped on its
+own, so memory usage is bounded by the size of a bucket rather than of
+the whole corpus.
+"""
+
+import argparse
+import collections
+import hashlib
+import heapq
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import po_reader
+import translation_stats
+
+Inconsistency = collections.namedtuple(
+    'Inconsistency', ['occurrences', 'language', 'msgid', 'variants'])
+
+
+def _bucket_of(language, key, buckets):
+    digest = hashlib.sha1(
+        (u'%s\0%s' % (language, key)).encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) % buckets
+
+
+def partition(paths, workdir, buckets):
+    """Write translated entries of catalogs under paths to bucket files.
+
+    Returns the list of bucket file names.
+    """
+    names = [os.path.join(workdir, 'bucket-%04d.jsonl' % i)
+             for i in range(buckets)]
+    files = [io.open(name, 'w', encoding='utf-8') for name in names]
+    try:
+        for path in paths:
+            for language, domain, po_path in translation_stats.find_catalogs(
+                    path):
+                for entry in po_reader.iter_entries(po_path):
+                    if entry.fuzzy or not entry.msgstr or not all(
+                            entry.msgstr):
+                        continue
+                    key = po_reader.normalize(entry.msgid)
+                    record = json.dumps([language, key, entry.msgid,
+                                         entry.msgstr[0].strip(), po_path,
+                                         entry.lineno])
+                    if not isinstance(record, type(u'')):
+                        record = record.decode('utf-8')
+                    files[_bucket_of(language, key, buckets)].write(
+                        record + u'\n')
+    finally:
+        for f in files:
+            f.close()
+    return names
+
+
+def _group_bucket(name):
+    groups = {}
+    with io.open(name, 'r', encoding='utf-8') as f:
+        for line in f:
+            language, key, msgid, msgstr, path, lineno = json.loads(line)
+            variants = groups.setdefault((language, key), [msgid, {}])[1]
+            variant = variants.setdefault(msgstr, [0, path, lineno])
+            variant[0] += 1
+    for (language, key), (msgid, variants) in groups.items():
+        if len(variants) < 2:
+            continue
+        ranked = sorted(((count, msgstr, path, lineno)
+                         for msgstr, (count, path, lineno)
+                         in variants.items()),
+                        key=lambda v: (-v[0], v[1]))
+        yield Inconsistency(sum(v[0] for v in ranked), language, msgid,
+                            ranked)
+
+
+def find_inconsistencies(paths, buckets=64, limit=50):
+    """Return msgids with several translations, most frequent first.
+
+    Only the top limit results are kept in memory (all if limit is 0).
+    """
+    workdir = tempfile.mkdtemp(prefix='i18n-consistency-')
+    try:
+        heap = []
+        for name in partition(paths, workdir, buckets):
+            for item in _group_bucket(name):
+                rank = (item.occurrences, len(item.variants),
+                        item.language, item.msgid)
+                if not limit or len(heap) < limit:
+                    heapq.heappush(heap, (rank, item))
+                elif rank > heap[0][0]:
+                    heapq.heapreplace(heap, (rank, item))
+            os.remove(name)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return [item for rank, item in sorted(heap, reverse=True)]
+
+
+def write_text(results, out):
+    for item in results:
+        out.write(u'%s: "%s" (%d occurrences, %d variants)\n'
+                  % (item.language, item.msgid, item.occurrences,
+                     len(item.variants)))
+        for count, msgstr, path, lineno in item.variants:
+            out.write(u'    %5d  "%s" (%s:%d)\n'
+                      % (count, msgstr, path, lineno))
+
+
+def write_json(results, out):
+    data = json.dumps([
+        {'language': item.language, 'msgid': item.msgid,
+         'occurrences': item.occurrences,
+         'variants': [{'msgstr': msgstr, 'count': count,
+                       'example': '%s:%d' % (path, lineno)}
+                      for count, msgstr, path, lineno in item.variants]}
+        for item in results], indent=4, ensure_ascii=False)
+    out.write(data if isinstance(data, type(u'')) else data.decode('utf-8'))
+    out.write(u'\n')
+
+
+WRITERS = {'text': write_text, 'json': write_json}
+
+
+def main(parsed_args):
+    results = find_inconsistencies(parsed_args.paths,
+                                   buckets=parsed_args.buckets,
+                                   limit=parsed_args.limit)
+    out = io.open(sys.stdout.fileno(), 'w', encoding='utf-8', closefd=False)
+    with out:
+        WRITERS[parsed_args.format](results, out)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('paths', nargs='*',
+                        default=[translation_stats.DEFAULT_LOCALE_DIR],
+                        help='Directories to search catalogs in. '
+                             'Default: i18n/locale of this repository')
+    parser.add_argument('-n', '--limit', type=int, default=50,
+                        help='Number of msgids to report, 0 for all. '
+                             'Default: 50')
+    parser.add_argument('-b', '--buckets', type=int, default=64,
+                        help='Number of on-disk buckets. Increase it to '
+                             'reduce memory usage on very large corpora. '
+                             'Default: 64')
+    parser.add_argument('-f', '--format', default='text',
+                        choices=sorted(WRITERS),
+                        help='Output format. Default: text')
+    parsed_args = parser.parse_args()
+
+    sys.exit(main(parsed_args))
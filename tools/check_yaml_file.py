@@ -12,20 +12,173 @@
 # limitations under the License.
 
 import argparse
+import multiprocessing
+import os
+import re
+import sys
 
 import yaml
 
+ROLES = ('translators', 'reviewers', 'coordinators')
+KNOWN_KEYS = ('language',) + ROLES
+LANGUAGE_CODE_PATTERN = re.compile(r'^[A-Za-z]{2,3}([-_@][A-Za-z0-9]+)*$')
+DEFAULT_LOCALE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  os.pardir, 'i18n', 'locale')
+
+# Messages with this prefix do not fail the check unless --strict is given.
+WARNING_PREFIX = 'warning: '
+
+# The C composer (libyaml) is much faster if available.
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def _normalize_locale(code):
+    return code.replace('_', '-').lower()
+
+
+def _locale_codes(locale_dir):
+    """Return a dict from normalized locale to its spelling in locale_dir."""
+    if not locale_dir or not os.path.isdir(locale_dir):
+        return {}
+    return dict((_normalize_locale(name), name.replace('_', '-'))
+                for name in os.listdir(locale_dir)
+                if os.path.isdir(os.path.join(locale_dir, name)))
+
+
+def _line(node):
+    return node.start_mark.line + 1
+
+
+def check_team(language_node, team_node, locale_codes):
+    """Check one language team and yield (line, message) tuples.
+
+    Messages starting with WARNING_PREFIX are warnings.
+    """
+    language_code = language_node.value
+    if not LANGUAGE_CODE_PATTERN.match(language_code):
+        yield (_line(language_node),
+               'invalid language code "%s"' % language_code)
+    expected = locale_codes.get(_normalize_locale(language_code))
+    if expected and expected != language_code:
+        yield (_line(language_node),
+               'language code "%s" does not match "%s" in i18n/locale'
+               % (language_code, expected))
+
+    if not isinstance(team_node, yaml.MappingNode):
+        yield (_line(team_node),
+               '%s: language team must be a mapping' % language_code)
+        return
+
+    members = {}
+    has_language = False
+    for key_node, value_node in team_node.value:
+        key = key_node.value
+        if key not in KNOWN_KEYS:
+            yield (_line(key_node),
+                   '%s: unknown key "%s"' % (language_code, key))
+        elif key == 'language':
+            has_language = bool(isinstance(value_node, yaml.ScalarNode) and
+                                value_node.value.strip())
+        elif not isinstance(value_node, yaml.SequenceNode):
+            yield (_line(value_node),
+                   '%s: %s must be a list' % (language_code, key))
+        else:
+            seen = members.setdefault(key, {})
+            for item in value_node.value:
+                if not isinstance(item, yaml.ScalarNode):
+                    yield (_line(item), '%s: %s must be a list of IDs'
+                           % (language_code, key))
+                elif item.value in seen:
+                    yield (_line(item), '%s: duplicate ID "%s" in %s '
+                           '(first at line %d)'
+                           % (language_code, item.value, key,
+                              seen[item.value]))
+                else:
+                    seen[item.value] = _line(item)
+
+    if not has_language:
+        yield (_line(language_node),
+               '%s: missing "language" field' % language_code)
+    translators = members.get('translators', {})
+    for role in ('reviewers', 'coordinators'):
+        for user_id, line in sorted(members.get(role, {}).items(),
+                                    key=lambda item: item[1]):
+            # Zanata allows this (e.g. a coordinator managing teams
+            # of languages the coordinator does not translate into).
+            if user_id not in translators:
+                yield (line, '%s%s: %s "%s" is not a translator'
+                       % (WARNING_PREFIX, language_code, role[:-1],
+                          user_id))
+
+
+def check_file(args):
+    """Validate a translation team YAML file.
+
+    Returns a list of (filename, line, message) tuples sorted by line.
+    """
+    filename, locale_dir = args
+    try:
+        with open(filename) as f:
+            root = yaml.compose(f, Loader=Loader)
+    except (IOError, OSError) as e:
+        return [(filename, 0, str(e))]
+    except yaml.YAMLError as e:
+        mark = getattr(e, 'problem_mark', None)
+        return [(filename, mark.line + 1 if mark else 0,
+                 'YAML syntax error: %s' % getattr(e, 'problem', e))]
+    if root is None:
+        return []
+    if not isinstance(root, yaml.MappingNode):
+        return [(filename, _line(root), 'top level must be a mapping')]
+
+    locale_codes = _locale_codes(locale_dir)
+    errors = []
+    seen_languages = {}
+    for language_node, team_node in root.value:
+        if language_node.value in seen_languages:
+            errors.append((filename, _line(language_node),
+                           'duplicate language "%s" (first at line %d)'
+                           % (language_node.value,
+                              seen_languages[language_node.value])))
+        seen_languages.setdefault(language_node.value, _line(language_node))
+        for line, message in check_team(language_node, team_node,
+                                        locale_codes):
+            errors.append((filename, line, message))
+    return sorted(errors, key=lambda error: error[1])
+
 
 def main(parsed_args):
-    filename = parsed_args.filename
-    with open(filename) as f:
-        data = f.read()
-    yaml.safe_load(data)
+    work = [(filename, parsed_args.locale_dir)
+            for filename in parsed_args.filename]
+    if len(work) > 1:
+        pool = multiprocessing.Pool(min(len(work),
+                                        multiprocessing.cpu_count()))
+        try:
+            results = pool.map(check_file, work)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [check_file(args) for args in work]
+
+    failed = False
+    for result in results:
+        for filename, line, message in result:
+            print('%s:%d: %s' % (filename, line, message))
+            if parsed_args.strict or not message.startswith(WARNING_PREFIX):
+                failed = True
+    return 1 if failed else 0
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('filename')
+    parser.add_argument('--locale-dir', default=DEFAULT_LOCALE_DIR,
+                        help=('Directory of the locale catalogs which '
+                              'language codes are checked against. '
+                              'Default: i18n/locale of this repository'))
+    parser.add_argument('--strict', action='store_true',
+                        help='Treat warnings as errors.')
+    parser.add_argument('filename', nargs='+')
     parsed_args = parser.parse_args()
 
-    main(parsed_args)
+    sys.exit(main(parsed_args))
@@ -0,0 +1,170 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streaming reader of PO/POT catalogs.
+
+Unlike babel.messages.pofile, entries are yielded one at a time while
+the memory-mapped file is scanned, so no catalog object is built.
+"""
+
+import codecs
+import collections
+import mmap
+import os
+import re
+
+Entry = collections.namedtuple(
+    'Entry', ['msgctxt', 'msgid', 'msgid_plural', 'msgstr', 'fuzzy',
+              'obsolete', 'lineno', 'flags'])
+
+_KEYWORD = re.compile(br'^(msgctxt|msgid_plural|msgid|msgstr(?:\[\d+\])?)'
+                      br'\s+(".*)$')
+_CHARSET = re.compile(r'charset=([\w-]+)', re.I)
+_ESCAPE = re.compile(br'\\(.)')
+_ESCAPES = {b'n': b'\n', b't': b'\t', b'r': b'\r', b'a': b'\a', b'b': b'\b',
+            b'f': b'\f', b'v': b'\v'}
+
+
+def normalize(text):
+    """Return text lowercased with whitespace collapsed."""
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def _unquote(value):
+    value = value.strip()
+    if value[:1] == b'"' and value[-1:] == b'"':
+        value = value[1:-1]
+    return _ESCAPE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+class _EntryBuilder(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.fields = collections.OrderedDict()
+        self.current = None
+        self.flags = set()
+        self.obsolete = False
+        self.lineno = None
+
+    def add(self, keyword, value, lineno, obsolete):
+        if keyword == 'msgid':
+            self.lineno = lineno
+        self.obsolete = self.obsolete or obsolete
+        self.current = keyword
+        self.fields[keyword] = [value]
+
+    def add_flags(self, flags):
+        self.flags.update(flag.strip().decode('ascii', 'ignore')
+                          for flag in flags.split(b','))
+
+    def build(self, charset):
+        fields = self.fields
+        if 'msgid' not in fields:
+            return None
+
+        def text(key):
+            value = fields.get(key)
+            return None if value is None else b''.join(value).decode(charset)
+
+        msgstr = [b''.join(value).decode(charset)
+                  for key, value in fields.items()
+                  if key.startswith('msgstr')]
+        return Entry(text('msgctxt'), text('msgid'), text('msgid_plural'),
+                     msgstr, 'fuzzy' in self.flags, self.obsolete,
+                     self.lineno, frozenset(self.flags))
+
+
+def _iter_lines(path):
+    size = os.path.getsize(path)
+    if not size:
+        return
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            line = mapped.readline()
+            while line:
+                yield line
+                line = mapped.readline()
+        finally:
+            mapped.close()
+
+
+def iter_entries(path, include_header=False, include_obsolete=False):
+    """Yield an Entry for each message of the catalog at path.
+
+    msgstr is a list with one string per plural form. flags holds the
+    flags written in the #, comments of the entry. Strings are decoded
+    with the charset declared in the header (UTF-8 by default).
+    """
+    charset = 'utf-8'
+    builder = _EntryBuilder()
+    lines = _iter_lines(path)
+    lineno = 0
+    while True:
+        line = next(lines, None)
+        lineno += 1
+        if line is not None:
+            line = line.strip()
+            obsolete = line.startswith(b'#~')
+            if obsolete:
+                line = line[2:].strip()
+            if not line:
+                continue
+            match = _KEYWORD.match(line)
+            keyword = match.group(1).decode('ascii') if match else None
+            if line.startswith(b'"'):
+                if builder.current in builder.fields:
+                    builder.fields[builder.current].append(_unquote(line))
+                continue
+            # A comment or a new msgctxt/msgid ends the previous entry.
+            starts_entry = (not match or
+                            keyword in ('msgctxt', 'msgid') and
+                            builder.current != 'msgctxt')
+            if not (starts_entry and 'msgid' in builder.fields):
+                if match:
+                    builder.add(keyword, _unquote(match.group(2)), lineno,
+                                obsolete)
+                elif line.startswith(b'#,'):
+                    builder.add_flags(line[2:])
+                continue
+
+        entry = builder.build(charset)
+        builder.reset()
+        if entry is not None:
+            if not entry.msgid and not entry.obsolete:
+                charset = _header_charset(entry, charset)
+            if ((entry.msgid or include_header) and
+                    (include_obsolete or not entry.obsolete)):
+                yield entry
+        if line is None:
+            return
+        if match:
+            builder.add(keyword, _unquote(match.group(2)), lineno, obsolete)
+        elif line.startswith(b'#,'):
+            builder.add_flags(line[2:])
+
+
+def _header_charset(entry, default):
+    # Templates made by xgettext keep the placeholder charset=CHARSET;
+    # like Babel, fall back to the default for it and unknown names.
+    match = _CHARSET.search(entry.msgstr[0] if entry.msgstr else '')
+    if not match or match.group(1).upper() == 'CHARSET':
+        return default
+    try:
+        codecs.lookup(match.group(1))
+    except LookupError:
+        return default
+    return match.group(1)
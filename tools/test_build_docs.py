@@ -0,0 +1,112 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of which languages build_docs.py rebuilds."""
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+import build_docs
+
+# Records the language of each build and creates the html directory.
+SPHINX_BUILD = '''#!%s
+import os
+import sys
+
+args = sys.argv[1:]
+language = 'source'
+if '-D' in args:
+    language = args[args.index('-D') + 1].split('=')[1]
+if not os.path.isdir(args[-1]):
+    os.makedirs(args[-1])
+with open(os.path.join(os.path.dirname(__file__), 'builds'), 'a') as f:
+    f.write(language + '\\n')
+'''
+
+PO_DATA = '''msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\\n"
+
+msgid "Title"
+msgstr "%s"
+'''
+
+
+class BuildDocsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.source_dir = os.path.join(self.tmpdir, 'source')
+        os.makedirs(self.source_dir)
+        for name in ('conf.py', 'index.rst'):
+            with open(os.path.join(self.source_dir, name), 'w') as f:
+                f.write('\n')
+        self.locale_dir = os.path.join(self.source_dir, 'locale')
+        self.write_po('ja', 'Taitoru')
+        self.write_po('de', 'Titel')
+
+        self.sphinx_build = os.path.join(self.tmpdir, 'sphinx-build')
+        with open(self.sphinx_build, 'w') as f:
+            f.write(SPHINX_BUILD % sys.executable)
+        os.chmod(self.sphinx_build,
+                 os.stat(self.sphinx_build).st_mode | stat.S_IXUSR)
+
+    def write_po(self, language, msgstr):
+        dirname = os.path.join(self.locale_dir, language, 'LC_MESSAGES')
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(os.path.join(dirname, 'index.po'), 'w') as f:
+            f.write(PO_DATA % msgstr)
+
+    def build(self, build_dir):
+        parsed_args = argparse.Namespace(
+            language=None, source_dir=self.source_dir, build_dir=build_dir,
+            locale_dir=self.locale_dir, sphinx_build=self.sphinx_build,
+            warning_is_error=False, jobs=1, force=False, pot=False,
+            verbose=False)
+        log_path = os.path.join(self.tmpdir, 'builds')
+        if os.path.exists(log_path):
+            os.remove(log_path)
+        self.assertEqual(0, build_docs.main(parsed_args))
+        if not os.path.exists(log_path):
+            return []
+        with open(log_path) as f:
+            return sorted(f.read().split())
+
+    def test_changed_catalog_rebuilds_its_language(self):
+        build_dir = os.path.join(self.tmpdir, 'build')
+        self.assertEqual(['de', 'ja', 'source'], self.build(build_dir))
+        self.write_po('ja', 'Taitoru (shin)')
+        self.assertEqual(['ja'], self.build(build_dir))
+
+    def test_build_dir_inside_sources(self):
+        build_dir = os.path.join(self.source_dir, '_build')
+        self.assertEqual(['de', 'ja', 'source'], self.build(build_dir))
+        self.assertEqual([], self.build(build_dir))
+
+    def test_changed_source_rebuilds_all(self):
+        build_dir = os.path.join(self.tmpdir, 'build')
+        self.build(build_dir)
+        with open(os.path.join(self.source_dir, 'index.rst'), 'w') as f:
+            f.write('Title\n=====\n')
+        self.assertEqual(['de', 'ja', 'source'], self.build(build_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
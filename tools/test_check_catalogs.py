@@ -0,0 +1,127 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of check_catalogs.py against the verdicts of msgfmt -c."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import check_catalogs
+
+PO_HEADER = b'''msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\\n"
+"Plural-Forms: nplurals=2; plural=(n != 1);\\n"
+
+'''
+
+
+class PercentFormatTest(unittest.TestCase):
+
+    def assertVerdict(self, msgid, msgstr, ok, partial=False):
+        problems = list(check_catalogs._check_percent_format(
+            msgid, msgstr, partial))
+        self.assertEqual(ok, not problems, problems)
+
+    def test_same_placeholders(self):
+        self.assertVerdict('%(name)s has %(count)d',
+                           '%(count)d: %(name)s', True)
+
+    def test_named_conversion_differs(self):
+        self.assertVerdict('%(a)s', '%(a)d', False)
+
+    def test_positional_conversions_swapped(self):
+        self.assertVerdict('%s of %d', '%d of %s', False)
+
+    def test_same_argument_type(self):
+        self.assertVerdict('%d files', '%i fichiers', True)
+
+    def test_percent_sign_is_not_an_argument(self):
+        self.assertVerdict('%s (%d%%)', '%s (%d pourcent)', True)
+
+    def test_missing_named_argument(self):
+        self.assertVerdict('%(a)s and %(b)s', '%(a)s', False)
+
+    def test_unknown_named_argument(self):
+        self.assertVerdict('%(a)s', '%(a)s %(c)s', False)
+
+    def test_plural_form_may_omit_number(self):
+        self.assertVerdict('One file', 'Un fichier', True, partial=True)
+        self.assertVerdict('%d files', 'Un fichier', True, partial=True)
+
+
+class CheckCatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write_po(self, body):
+        path = os.path.join(self.tmpdir, 'test.po')
+        with open(path, 'wb') as f:
+            f.write(PO_HEADER + body)
+        return path
+
+    def test_python_format_error(self):
+        path = self.write_po(b'#, python-format\n'
+                             b'msgid "%s of %d"\n'
+                             b'msgstr "%d of %s"\n')
+        digest, problems = check_catalogs.check_catalog(path)
+        self.assertEqual(1, len(problems))
+
+    def test_clean_catalog(self):
+        path = self.write_po(b'#, python-format\n'
+                             b'msgid "%s (%d%%)"\n'
+                             b'msgstr "%s (%d pourcent)"\n')
+        digest, problems = check_catalogs.check_catalog(path)
+        self.assertEqual([], problems)
+
+    def test_unflagged_percent_sign(self):
+        # Babel flags this msgid as python-format, msgfmt does not.
+        path = self.write_po(b'msgid "It is set to 95% of the width."\n'
+                             b'msgstr "Il est a 95 pour cent."\n')
+        digest, problems = check_catalogs.check_catalog(path)
+        self.assertEqual([], problems)
+
+    def test_unflagged_brace_format(self):
+        path = self.write_po(b'msgid "Hello {$name$}"\n'
+                             b'msgstr "Bonjour"\n')
+        digest, problems = check_catalogs.check_catalog(path)
+        self.assertEqual([], problems)
+
+    def test_unterminated_string(self):
+        path = self.write_po(b'msgid "Hello"\n'
+                             b'msgstr "Bonjour\n')
+        digest, problems = check_catalogs.check_catalog(path)
+        self.assertEqual([(7, 'syntax error: invalid line')], problems)
+
+    def test_cache_of_other_version_is_discarded(self):
+        path = self.write_po(b'msgid "Hello"\n'
+                             b'msgstr "Bonjour"\n')
+        digest, problems = check_catalogs.check_catalog(path)
+        cache_path = os.path.join(self.tmpdir, 'cache.json')
+        with open(cache_path, 'w') as f:
+            json.dump({os.path.abspath(path): digest}, f)
+        self.assertFalse(check_catalogs.CheckCache(cache_path).is_clean(path))
+
+        cache = check_catalogs.CheckCache(cache_path)
+        cache.update(path, digest, True)
+        cache.save()
+        self.assertTrue(check_catalogs.CheckCache(cache_path).is_clean(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of po_reader.py against babel.messages.pofile."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from babel.messages import pofile
+
+import po_reader
+import translation_stats
+
+PO_DATA = b'''# Translators:
+msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\\n"
+"Plural-Forms: nplurals=2; plural=(n != 1);\\n"
+
+#: a.py:1
+msgid "Simple"
+msgstr "Einfach"
+
+msgctxt "menu"
+msgid "Open"
+msgstr "\xc3\x96ffnen"
+
+msgctxt "verb"
+msgid "Open"
+msgstr "Oeffnen"
+
+#, python-format
+msgid "%d file"
+msgid_plural "%d files"
+msgstr[0] "%d Datei"
+msgstr[1] "%d Dateien"
+
+#, fuzzy
+msgid ""
+"A long "
+"message\\n"
+"with \\"quotes\\" and\\ttabs"
+msgstr ""
+"Eine lange "
+"Nachricht\\n"
+
+msgid "Untranslated"
+msgstr ""
+
+#~ msgid "Old"
+#~ msgstr "Alt"
+
+#~ msgid "Old "
+#~ "multi-line"
+#~ msgstr "Alt "
+#~ "mehrzeilig"
+'''
+
+
+def _babel_entries(path):
+    """Return (obsolete, msgctxt, msgid, msgid_plural, msgstr, fuzzy)."""
+    with open(path, 'rb') as f:
+        catalog = pofile.read_po(f)
+    entries = []
+    for obsolete, messages in ((False, list(catalog)[1:]),
+                               (True, catalog.obsolete.values())):
+        for message in messages:
+            if isinstance(message.id, (list, tuple)):
+                msgid, msgid_plural = message.id
+                msgstr = list(message.string)
+            else:
+                msgid, msgid_plural = message.id, None
+                msgstr = [message.string]
+            entries.append((obsolete, message.context, msgid, msgid_plural,
+                            msgstr, message.fuzzy))
+    return sorted(entries, key=repr)
+
+
+def _reader_entries(path):
+    return sorted(((entry.obsolete, entry.msgctxt, entry.msgid,
+                    entry.msgid_plural, entry.msgstr, entry.fuzzy)
+                   for entry in po_reader.iter_entries(
+                       path, include_obsolete=True)), key=repr)
+
+
+class IterEntriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'test.po')
+        with open(self.path, 'wb') as f:
+            f.write(PO_DATA)
+
+    def entries(self, **kwargs):
+        return list(po_reader.iter_entries(self.path, **kwargs))
+
+    def test_same_as_babel(self):
+        self.assertEqual(_babel_entries(self.path),
+                         _reader_entries(self.path))
+
+    def test_msgctxt(self):
+        opens = [entry for entry in self.entries() if entry.msgid == 'Open']
+        self.assertEqual([('menu', [u'\xd6ffnen']),
+                          ('verb', [u'Oeffnen'])],
+                         [(entry.msgctxt, entry.msgstr) for entry in opens])
+
+    def test_plural(self):
+        entry = [entry for entry in self.entries()
+                 if entry.msgid_plural][0]
+        self.assertEqual('%d file', entry.msgid)
+        self.assertEqual('%d files', entry.msgid_plural)
+        self.assertEqual(['%d Datei', '%d Dateien'], entry.msgstr)
+        self.assertFalse(entry.fuzzy)
+
+    def test_multi_line_and_escapes(self):
+        entry = [entry for entry in self.entries() if entry.fuzzy][0]
+        self.assertEqual('A long message\nwith "quotes" and\ttabs',
+                         entry.msgid)
+        self.assertEqual(['Eine lange Nachricht\n'], entry.msgstr)
+
+    def test_obsolete(self):
+        self.assertFalse(any(entry.obsolete for entry in self.entries()))
+        obsolete = [entry for entry in self.entries(include_obsolete=True)
+                    if entry.obsolete]
+        self.assertEqual([('Old', ['Alt']),
+                          ('Old multi-line', ['Alt mehrzeilig'])],
+                         [(entry.msgid, entry.msgstr)
+                          for entry in obsolete])
+
+    def test_header(self):
+        self.assertNotEqual('', self.entries()[0].msgid)
+        header = self.entries(include_header=True)[0]
+        self.assertEqual('', header.msgid)
+        self.assertIn('charset=UTF-8', header.msgstr[0])
+
+    def test_line_numbers(self):
+        # Each entry is located at its msgid keyword.
+        self.assertEqual([8, 12, 16, 20, 26, 34],
+                         [entry.lineno for entry in self.entries()])
+
+    def test_header_charset(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'msgid ""\nmsgstr ""\n'
+                    b'"Content-Type: text/plain; charset=ISO-8859-1\\n"\n\n'
+                    b'msgid "Open"\nmsgstr "\xd6ffnen"\n')
+        self.assertEqual([u'\xd6ffnen'], self.entries()[0].msgstr)
+
+    def test_template_charset_placeholder(self):
+        # The header of a POT file as generated by xgettext.
+        with open(self.path, 'wb') as f:
+            f.write(b'#, fuzzy\nmsgid ""\nmsgstr ""\n'
+                    b'"Project-Id-Version: PACKAGE VERSION\\n"\n'
+                    b'"Language: \\n"\n'
+                    b'"MIME-Version: 1.0\\n"\n'
+                    b'"Content-Type: text/plain; charset=CHARSET\\n"\n'
+                    b'"Content-Transfer-Encoding: 8bit\\n"\n\n'
+                    b'msgid "Open"\nmsgstr ""\n')
+        self.assertEqual([('Open', [''])],
+                         [(entry.msgid, entry.msgstr)
+                          for entry in self.entries()])
+
+    def test_unknown_charset(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'msgid ""\nmsgstr ""\n'
+                    b'"Content-Type: text/plain; charset=NO-SUCH-CODEC\\n"'
+                    b'\n\nmsgid "Open"\nmsgstr "\xc3\x96ffnen"\n')
+        self.assertEqual([u'\xd6ffnen'], self.entries()[0].msgstr)
+
+    def test_catalogs_of_this_repository(self):
+        for language, domain, path in translation_stats.find_catalogs(
+                translation_stats.DEFAULT_LOCALE_DIR):
+            self.assertEqual(_babel_entries(path), _reader_entries(path),
+                             path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,274 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Look up how terms are translated across PO catalogs.
+
+Messages of all catalogs under a locale directory are stored in an
+SQLite index with a hash of the normalized msgid for exact lookups and
+a character trigram inverted index for fuzzy lookups. Only catalogs
+changed since the last run are re-indexed.
+"""
+
+import argparse
+import collections
+import hashlib
+import os
+import sqlite3
+import sys
+
+import po_reader
+import translation_stats
+
+NGRAM = 3
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalogs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    language TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    sha1 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    catalog_id INTEGER NOT NULL,
+    language TEXT NOT NULL,
+    msgid_hash TEXT NOT NULL,
+    msgid TEXT NOT NULL,
+    msgstr TEXT NOT NULL,
+    fuzzy INTEGER NOT NULL,
+    lineno INTEGER,
+    ngrams INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_msgid_hash
+    ON messages (msgid_hash, language);
+CREATE INDEX IF NOT EXISTS messages_catalog ON messages (catalog_id);
+CREATE TABLE IF NOT EXISTS ngrams (
+    ngram TEXT NOT NULL,
+    message_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ngrams_ngram ON ngrams (ngram);
+CREATE INDEX IF NOT EXISTS ngrams_message ON ngrams (message_id);
+"""
+
+
+def _default_index():
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                        os.path.join(os.path.expanduser('~'), '.cache'),
+                        'openstack-i18n', 'translation-memory.sqlite')
+
+
+def text_hash(text):
+    return hashlib.sha1(po_reader.normalize(text).encode('utf-8')).hexdigest()
+
+
+def ngrams(text):
+    padded = ' %s ' % po_reader.normalize(text)
+    return set(padded[i:i + NGRAM]
+               for i in range(max(1, len(padded) - NGRAM + 1)))
+
+
+def _file_sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class TranslationMemory(object):
+    """Index of translated messages of PO catalogs."""
+
+    def __init__(self, path):
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _remove_catalog(self, catalog_id):
+        self.conn.execute(
+            'DELETE FROM ngrams WHERE message_id IN '
+            '(SELECT id FROM messages WHERE catalog_id = ?)', (catalog_id,))
+        self.conn.execute('DELETE FROM messages WHERE catalog_id = ?',
+                          (catalog_id,))
+        self.conn.execute('DELETE FROM catalogs WHERE id = ?', (catalog_id,))
+
+    def _add_catalog(self, path, language, st, sha1):
+        cursor = self.conn.execute(
+            'INSERT INTO catalogs (path, language, mtime, size, sha1) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (path, language, st.st_mtime, st.st_size, sha1))
+        catalog_id = cursor.lastrowid
+        for entry in po_reader.iter_entries(path):
+            msgstr = entry.msgstr[0] if entry.msgstr else ''
+            if not msgstr:
+                continue
+            grams = ngrams(entry.msgid)
+            cursor = self.conn.execute(
+                'INSERT INTO messages (catalog_id, language, msgid_hash, '
+                'msgid, msgstr, fuzzy, lineno, ngrams) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (catalog_id, language, text_hash(entry.msgid), entry.msgid,
+                 msgstr, int(entry.fuzzy), entry.lineno, len(grams)))
+            self.conn.executemany(
+                'INSERT INTO ngrams (ngram, message_id) VALUES (?, ?)',
+                ((gram, cursor.lastrowid) for gram in grams))
+
+    def update(self, locale_dir):
+        """Re-index catalogs changed since the last update.
+
+        A catalog is unchanged while it has the same modification time
+        and size, or the same SHA-1 hash. Returns the number of
+        catalogs (re-)indexed and removed.
+        """
+        indexed = dict(
+            (row[0], row[1:]) for row in self.conn.execute(
+                'SELECT path, id, mtime, size, sha1 FROM catalogs'))
+        updated = 0
+        with self.conn:
+            seen = set()
+            for language, domain, path in translation_stats.find_catalogs(
+                    locale_dir):
+                path = os.path.abspath(path)
+                seen.add(path)
+                st = os.stat(path)
+                old = indexed.get(path)
+                if old and (old[1], old[2]) == (st.st_mtime, st.st_size):
+                    continue
+                sha1 = _file_sha1(path)
+                if old and old[3] == sha1:
+                    self.conn.execute(
+                        'UPDATE catalogs SET mtime = ?, size = ? '
+                        'WHERE id = ?', (st.st_mtime, st.st_size, old[0]))
+                    continue
+                if old:
+                    self._remove_catalog(old[0])
+                self._add_catalog(path, language, st, sha1)
+                updated += 1
+            prefix = os.path.join(os.path.abspath(locale_dir), '')
+            removed = [old[0] for path, old in indexed.items()
+                       if path.startswith(prefix) and path not in seen]
+            for catalog_id in removed:
+                self._remove_catalog(catalog_id)
+        return updated, len(removed)
+
+    def _language_filter(self, language, column='messages.language'):
+        if not language:
+            return '', ()
+        return ' AND %s = ?' % column, (language,)
+
+    def lookup(self, text, language=None):
+        """Return translations of msgids equal to text when normalized.
+
+        The result is a list of (language, msgstr, count) tuples, the
+        most frequent translation of each language first.
+        """
+        where, params = self._language_filter(language)
+        rows = self.conn.execute(
+            'SELECT language, msgstr, COUNT(*) FROM messages '
+            'WHERE msgid_hash = ? AND fuzzy = 0' + where +
+            ' GROUP BY language, msgstr '
+            'ORDER BY language, COUNT(*) DESC, msgstr',
+            (text_hash(text),) + params)
+        return rows.fetchall()
+
+    def search(self, text, language=None, min_score=0.5, limit=20):
+        """Return messages whose msgid is similar to text.
+
+        The similarity is the Dice coefficient of the character
+        trigrams. The result is a list of (score, language, msgid,
+        msgstr, path, lineno) tuples, best first.
+        """
+        grams = sorted(ngrams(text))
+        where, params = self._language_filter(language)
+        placeholders = ', '.join('?' * len(grams))
+        rows = self.conn.execute(
+            'SELECT 2.0 * COUNT(*) / (? + messages.ngrams) AS score, '
+            'messages.language, messages.msgid, messages.msgstr, '
+            'catalogs.path, messages.lineno '
+            'FROM ngrams '
+            'JOIN messages ON messages.id = ngrams.message_id '
+            'JOIN catalogs ON catalogs.id = messages.catalog_id '
+            'WHERE ngrams.ngram IN (%s) AND messages.fuzzy = 0%s '
+            'GROUP BY messages.id HAVING score >= ? '
+            'ORDER BY score DESC, messages.language, messages.msgid '
+            'LIMIT ?' % (placeholders, where),
+            [len(grams)] + grams + list(params) + [min_score, limit])
+        return rows.fetchall()
+
+
+def _print_lookup(results):
+    translations = collections.OrderedDict()
+    for language, msgstr, count in results:
+        translations.setdefault(language, []).append((msgstr, count))
+    for language, items in translations.items():
+        print('%s: %s' % (language, ', '.join(
+            '%s (%d)' % (msgstr, count) for msgstr, count in items)))
+
+
+def main(parsed_args):
+    tm = TranslationMemory(parsed_args.index)
+    try:
+        if parsed_args.command == 'update' or not parsed_args.no_update:
+            updated, removed = tm.update(parsed_args.locale_dir)
+            if parsed_args.command == 'update':
+                print('%d catalogs indexed, %d removed' % (updated, removed))
+        if parsed_args.command == 'lookup':
+            results = tm.lookup(parsed_args.text, parsed_args.language)
+            _print_lookup(results)
+            if not results or parsed_args.fuzzy:
+                for (score, language, msgid, msgstr, path,
+                     lineno) in tm.search(parsed_args.text,
+                                          parsed_args.language,
+                                          parsed_args.min_score,
+                                          parsed_args.limit):
+                    print('%.2f %s: %s -> %s (%s:%d)'
+                          % (score, language, msgid, msgstr, path, lineno))
+    finally:
+        tm.close()
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--index', default=_default_index(),
+                        help='Index file. Default: %(default)s')
+    parser.add_argument('--locale-dir',
+                        default=translation_stats.DEFAULT_LOCALE_DIR,
+                        help='Directory to search catalogs in. '
+                             'Default: i18n/locale of this repository')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    subparsers.add_parser('update', help='Update the index.')
+    lookup_parser = subparsers.add_parser(
+        'lookup', help='Show translations of a msgid.')
+    lookup_parser.add_argument('text')
+    lookup_parser.add_argument('-l', '--language',
+                               help='Language to show, e.g. ja')
+    lookup_parser.add_argument('--fuzzy', action='store_true',
+                               help='Show similar msgids even if there '
+                                    'are exact matches.')
+    lookup_parser.add_argument('--min-score', type=float, default=0.5,
+                               help='Minimum similarity of similar '
+                                    'msgids. Default: 0.5')
+    lookup_parser.add_argument('--limit', type=int, default=20,
+                               help='Maximum number of similar msgids. '
+                                    'Default: 20')
+    lookup_parser.add_argument('--no-update', action='store_true',
+                               help='Do not update the index first.')
+    parsed_args = parser.parse_args()
+    if parsed_args.command == 'update':
+        parsed_args.no_update = False
+
+    sys.exit(main(parsed_args))
@@ -0,0 +1,243 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Translation progress of local PO catalogs.
+
+Messages and words of each catalog are counted as translated, fuzzy or
+untranslated against its POT template, without accessing Zanata.
+"""
+
+import argparse
+import collections
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+import six
+
+import po_reader
+
+STATES = ('translated', 'fuzzy', 'untranslated')
+DEFAULT_LOCALE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  os.pardir, 'i18n', 'locale')
+
+# Templates parsed in this process, keyed by path.
+_templates = {}
+
+
+def find_catalogs(locale_dir):
+    """Yield (language, domain, po_path) of catalogs under locale_dir.
+
+    A catalog is a <language>/LC_MESSAGES/<domain>.po file at any depth,
+    so trees of several projects can be scanned at once.
+    """
+    for dirpath, dirnames, filenames in os.walk(locale_dir):
+        dirnames.sort()
+        if os.path.basename(dirpath) != 'LC_MESSAGES':
+            continue
+        language = os.path.basename(os.path.dirname(dirpath))
+        for filename in sorted(filenames):
+            if filename.endswith('.po'):
+                yield (language, filename[:-3],
+                       os.path.join(dirpath, filename))
+
+
+def find_template(po_path, domain, template=None):
+    """Return the POT file of a catalog.
+
+    <domain>.pot is looked up next to the language directories, which
+    is the layout of i18n/locale and of OpenStack projects.
+    """
+    if template:
+        return template
+    locale_dir = os.path.dirname(os.path.dirname(os.path.dirname(po_path)))
+    path = os.path.join(locale_dir, '%s.pot' % domain)
+    return path if os.path.exists(path) else None
+
+
+def _key(entry):
+    return entry.msgctxt, entry.msgid
+
+
+def _words(entry):
+    return len(entry.msgid.split())
+
+
+def _load_template(pot_path):
+    if pot_path not in _templates:
+        _templates[pot_path] = collections.OrderedDict(
+            (_key(entry), _words(entry))
+            for entry in po_reader.iter_entries(pot_path))
+    return _templates[pot_path]
+
+
+def _state(entry):
+    if not entry or not any(entry.msgstr):
+        return 'untranslated'
+    if entry.fuzzy:
+        return 'fuzzy'
+    return 'translated' if all(entry.msgstr) else 'untranslated'
+
+
+def new_counts():
+    return {'messages': dict.fromkeys(STATES, 0),
+            'words': dict.fromkeys(STATES, 0)}
+
+
+def catalog_stats(args):
+    """Count messages and words of a catalog by translation state."""
+    language, domain, po_path, pot_path = args
+    counts = new_counts()
+    if pot_path:
+        template = _load_template(pot_path)
+        states = {}
+        for entry in po_reader.iter_entries(po_path):
+            key = _key(entry)
+            if key in template:
+                states[key] = _state(entry)
+        for key, words in template.items():
+            state = states.get(key, 'untranslated')
+            counts['messages'][state] += 1
+            counts['words'][state] += words
+    else:
+        for entry in po_reader.iter_entries(po_path):
+            state = _state(entry)
+            counts['messages'][state] += 1
+            counts['words'][state] += _words(entry)
+    return {'language': language, 'catalog': domain, 'path': po_path,
+            'template': pot_path, 'messages': counts['messages'],
+            'words': counts['words']}
+
+
+def collect_stats(locale_dir, template=None, jobs=0):
+    work = [(language, domain, path, find_template(path, domain, template))
+            for language, domain, path in find_catalogs(locale_dir)]
+    if len(work) > 1 and jobs != 1:
+        pool = multiprocessing.Pool(jobs or None)
+        try:
+            # chunksize only batches the dispatch of work to cut the IPC
+            # overhead. Templates are cached by each worker process, so
+            # a worker parses a template at most once.
+            results = pool.map(catalog_stats, work,
+                               chunksize=max(1, len(work) // (
+                                   (jobs or multiprocessing.cpu_count()) *
+                                   4)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [catalog_stats(args) for args in work]
+    return results
+
+
+def summarize_languages(results):
+    """Return per-language totals of the catalog results."""
+    languages = collections.OrderedDict()
+    for result in sorted(results, key=lambda r: r['language']):
+        total = languages.setdefault(result['language'], new_counts())
+        for unit in ('messages', 'words'):
+            for state in STATES:
+                total[unit][state] += result[unit][state]
+    return [{'language': language, 'catalog': None,
+             'messages': counts['messages'], 'words': counts['words']}
+            for language, counts in languages.items()]
+
+
+def _percent(counts):
+    total = sum(counts.values())
+    return 100.0 * counts['translated'] / total if total else 100.0
+
+
+def _rows(results):
+    for result in results:
+        row = [result['language'], result['catalog'] or '*']
+        for unit in ('messages', 'words'):
+            row += [result[unit][state] for state in STATES]
+            row.append('%.1f' % _percent(result[unit]))
+        yield row
+
+
+HEADER = (['language', 'catalog'] +
+          ['%s_%s' % (unit, column) for unit in ('messages', 'words')
+           for column in STATES + ('percent',)])
+
+
+def write_text(results, out):
+    widths = [max(len(str(value)) for value in column)
+              for column in zip(HEADER, *list(_rows(results)))]
+    for row in [HEADER] + list(_rows(results)):
+        out.write('  '.join(str(value).ljust(width) for value, width
+                            in zip(row, widths)).rstrip() + '\n')
+
+
+def write_csv(results, out):
+    writer = csv.writer(out)
+    writer.writerow(HEADER)
+    writer.writerows(_rows(results))
+
+
+def write_json(results, out):
+    out.write(json.dumps(results, indent=4, sort_keys=True) + '\n')
+
+
+WRITERS = {'text': write_text, 'csv': write_csv, 'json': write_json}
+
+
+def _open_output(output_file, file_format):
+    # The csv module writes its own line endings.
+    if six.PY2:
+        return open(output_file, 'wb')
+    if file_format == 'csv':
+        return open(output_file, 'w', newline='')
+    return open(output_file, 'w')
+
+
+def main(parsed_args):
+    results = collect_stats(parsed_args.locale_dir,
+                            template=parsed_args.template,
+                            jobs=parsed_args.jobs)
+    if not parsed_args.catalogs:
+        results = summarize_languages(results)
+    if parsed_args.output_file:
+        with _open_output(parsed_args.output_file,
+                          parsed_args.format) as out:
+            WRITERS[parsed_args.format](results, out)
+    else:
+        WRITERS[parsed_args.format](results, sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('locale_dir', nargs='?', default=DEFAULT_LOCALE_DIR,
+                        help='Directory to search catalogs in. '
+                             'Default: i18n/locale of this repository')
+    parser.add_argument('-t', '--template',
+                        help='POT file to count all catalogs against. '
+                             'Default: <domain>.pot of each catalog')
+    parser.add_argument('-c', '--catalogs', action='store_true',
+                        help='Report each catalog instead of per-language '
+                             'totals.')
+    parser.add_argument('-f', '--format', default='text',
+                        choices=sorted(WRITERS),
+                        help='Output format. Default: text')
+    parser.add_argument('-o', '--output-file',
+                        help='Output file. Default: standard output')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='Number of worker processes. '
+                             'Default: number of CPUs')
+    parsed_args = parser.parse_args()
+
+    sys.exit(main(parsed_args))
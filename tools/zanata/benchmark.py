@@ -0,0 +1,200 @@
+#!/usr/bin/python
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the Zanata tools against the fake Zanata server.
+
+The fake server runs in a separate process so that it does not compete
+with the measured pipeline for the interpreter. For each scenario the
+wall time, the number of requests seen by the server, requests per
+second and the peak memory allocated by the pipeline are reported.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import requests
+import six
+import yaml
+
+import fake_zanata
+import zanata_client
+import zanata_stats
+import zanata_users
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+
+def _serve(options, queue):
+    server = fake_zanata.FakeZanataServer(
+        ('127.0.0.1', 0), fake_zanata.make_data(options),
+        latency=options.latency, error_rate=options.error_rate)
+    queue.put(server.url)
+    server.serve_forever()
+
+
+class _Quiet(object):
+    """Suppress the progress output of the measured pipeline."""
+
+    def __enter__(self):
+        self._stdout = sys.stdout
+        self._stderr = sys.stderr
+        sys.stdout = six.StringIO()
+        sys.stderr = six.StringIO()
+
+    def __exit__(self, *exc_info):
+        sys.stdout = self._stdout
+        sys.stderr = self._stderr
+
+
+def _measure(name, server_url, func):
+    requests.get(server_url + '_fake/reset')
+    if tracemalloc:
+        tracemalloc.start()
+    start = time.time()
+    with _Quiet():
+        func()
+    elapsed = time.time() - start
+    if tracemalloc:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        # ru_maxrss is in kilobytes on Linux.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    counters = requests.get(server_url + '_fake/counters').json()
+    return {
+        'scenario': name,
+        'wall_time': round(elapsed, 3),
+        'requests': counters['requests'],
+        'errors': counters['errors'],
+        'bytes': counters['bytes_sent'],
+        'requests_per_second': round(counters['requests'] / elapsed, 1)
+        if elapsed else None,
+        'peak_memory': peak,
+    }
+
+
+def bench_roster(server_url, workdir, jobs):
+    zanata_users.base_url = server_url + '%s'
+    zanata_client.configure(max_connections=jobs)
+    output_file = os.path.join(workdir, 'translation_team.yaml')
+
+    def run():
+        data = zanata_users.collect_zanata_language_and_members(jobs=jobs)
+        zanata_users.save_to_yaml(data, output_file)
+
+    return _measure('users jobs=%d' % jobs, server_url, run)
+
+
+def bench_stats(server_url, workdir, team_file, options, jobs, bulk):
+    zanata_stats.ZANATA_URI = server_url + 'rest/%s'
+    zanata_client.configure(max_connections=jobs)
+    output_file = os.path.join(workdir, 'stats.csv')
+
+    def run():
+        language_teams = zanata_stats.read_language_team_yaml(team_file,
+                                                              None)
+        users = zanata_stats.get_zanata_stats(
+            options.start_date, options.end_date, language_teams, None,
+            jobs=jobs, bulk=bulk)
+        zanata_stats.write_stats_to_file(users, output_file, 'csv', False)
+
+    name = 'stats jobs=%d%s' % (jobs, ' bulk' if bulk else '')
+    return _measure(name, server_url, run)
+
+
+def _print_results(results):
+    columns = ['scenario', 'wall_time', 'requests', 'requests_per_second',
+               'errors', 'peak_memory']
+    widths = [max(len(column), 20 if column == 'scenario' else 0)
+              for column in columns]
+    print('  '.join(column.ljust(width)
+                    for column, width in zip(columns, widths)))
+    for result in results:
+        print('  '.join(str(result[column]).ljust(width)
+                        for column, width in zip(columns, widths)))
+
+
+def _comma_separated_ints(s):
+    return [int(i) for i in s.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    fake_zanata.add_data_arguments(parser)
+    parser.add_argument("-j", "--jobs",
+                        type=_comma_separated_ints, default=[1, 8],
+                        help=("Comma-separated numbers of jobs to "
+                              "benchmark zanata_stats and zanata_users "
+                              "with. Default: 1,8"))
+    parser.add_argument("--bulk",
+                        action='store_true',
+                        help="Also benchmark zanata_stats with --bulk.")
+    parser.add_argument("--pipeline",
+                        choices=['all', 'stats', 'users'], default='all',
+                        help="Pipeline to benchmark. Default: all")
+    parser.add_argument("-s", "--start-date", default='2017-01-01',
+                        help="Start date of the stats. Default: 2017-01-01")
+    parser.add_argument("-e", "--end-date", default='2017-06-30',
+                        help="End date of the stats. Default: 2017-06-30")
+    parser.add_argument("-o", "--output-file",
+                        help="Write the results to this JSON file.")
+    options = parser.parse_args()
+
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(options, queue))
+    server.daemon = True
+    server.start()
+    server_url = queue.get()
+    workdir = tempfile.mkdtemp()
+
+    results = []
+    try:
+        if options.pipeline in ('all', 'users'):
+            for jobs in options.jobs:
+                results.append(bench_roster(server_url, workdir, jobs))
+        if options.pipeline in ('all', 'stats'):
+            team_file = os.path.join(workdir, 'team.yaml')
+            with open(team_file, 'w') as f:
+                yaml.safe_dump(
+                    fake_zanata.make_data(options).team_yaml_data(), f)
+            for jobs in options.jobs:
+                for bulk in [False, True] if options.bulk else [False]:
+                    results.append(bench_stats(server_url, workdir,
+                                               team_file, options, jobs,
+                                               bulk))
+    finally:
+        server.terminate()
+        shutil.rmtree(workdir)
+
+    _print_results(results)
+    if options.output_file:
+        with open(options.output_file, 'w') as f:
+            json.dump({'parameters': vars(options), 'results': results},
+                      f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/python
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Offline stand-in for translate.openstack.org.
+
+It serves the Zanata REST endpoints used by zanata_stats.py and the
+HTML language and member pages scraped by zanata_users.py. All data is
+generated deterministically from a seed, so runs are reproducible.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import zlib
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+VERSIONS = ['master', 'stable-ocata', 'stable-newton', 'stable-mitaka',
+            'stable-liberty', 'stable-kilo', 'stable-juno', 'stable-icehouse']
+# A version which zanata_stats is expected to skip.
+INVALID_VERSION = 'feature-zuulv3'
+
+
+class FakeZanataData(object):
+    """Deterministically generated Zanata projects, users and stats."""
+
+    def __init__(self, users=1000, languages=50, projects=60, versions=3,
+                 activity=0.05, seed=0):
+        self.seed = seed
+        self.activity = activity
+        self.languages = ['l%03d' % i for i in range(languages)]
+        self.projects = ['project-%d' % i for i in range(projects)]
+        self.versions = VERSIONS[:versions] + [INVALID_VERSION]
+        self.users = ['user%05d' % i for i in range(users)]
+        self.members = dict((lang, []) for lang in self.languages)
+        self.user_lang = {}
+        for i, user in enumerate(self.users):
+            lang = self.languages[i % languages]
+            self.user_lang[user] = lang
+            roles = ['Translator']
+            if i % 10 == 0:
+                roles.append('Reviewer')
+            if i % 50 == 0:
+                roles.append('Coordinator')
+            self.members[lang].append((user, roles))
+
+    def _hash(self, *keys):
+        key = '/'.join(str(k) for k in (self.seed,) + keys)
+        return zlib.crc32(key.encode('utf-8')) & 0xffffffff
+
+    def is_active(self, user, project, version, date_range):
+        return (self._hash(user, project, version, date_range) % 10000 <
+                self.activity * 10000)
+
+    def user_stats(self, user, project, version, date_range):
+        if (user not in self.user_lang or
+                not self.is_active(user, project, version, date_range)):
+            return {user: {}}
+        h = self._hash('stats', user, project, version, date_range)
+        return {user: {self.user_lang[user]: {
+            'translated': h % 500,
+            'approved': (h >> 9) % 200,
+            'rejected': (h >> 17) % 20,
+        }}}
+
+    def contributors(self, project, version, date_range):
+        return [{'username': user} for user in self.users
+                if self.is_active(user, project, version, date_range)]
+
+    def team_yaml_data(self):
+        """Return the language teams in the translation_team.yaml layout."""
+        teams = {}
+        for lang in self.languages:
+            team = {'language': 'Language %s' % lang}
+            for user, roles in self.members[lang]:
+                for role in roles:
+                    team.setdefault(role.lower() + 's', []).append(user)
+            teams[lang] = team
+        return teams
+
+
+def _language_list_html(data):
+    items = []
+    for lang in data.languages:
+        items.append(
+            '<li><a href="language/view/%(lang)s">'
+            '<h3 class="list__title">\n%(name)s\n</h3>'
+            '<span class="list__item__meta">%(lang)s (%(name)s)</span>'
+            '<span class="txt--understated">\n%(count)d\n</span>'
+            '</a></li>' % {'lang': lang, 'name': 'Language %s' % lang,
+                           'count': len(data.members[lang])})
+    return ('<html><body><ul class="list--stats">%s</ul></body></html>'
+            % ''.join(items))
+
+
+def _language_members_html(data, lang):
+    items = []
+    for user, roles in data.members[lang]:
+        role_items = ''.join(
+            '<li><i class="i %s"></i> %s</li>' %
+            ('i--checkmark' if role in roles else 'i--cross', role)
+            for role in ('Translator', 'Reviewer', 'Coordinator'))
+        items.append(
+            '<li class="l--pad-all-quarter">'
+            '<span class="list__item__meta">\n%s\n</span>'
+            '<ul class="list--horizontal">%s</ul></li>' % (user, role_items))
+    return ('<html><body><ul class="list--stats">%s</ul></body></html>'
+            % ''.join(items))
+
+
+class FakeZanataHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Buffer the response so that headers and body are sent together.
+    # Otherwise delayed ACKs stall every keep-alive response by tens of
+    # milliseconds. The buffer is flushed after each request.
+    wbufsize = -1
+
+    routes = [
+        (re.compile(r'^/rest/projects$'), 'projects'),
+        (re.compile(r'^/rest/projects/p/([^/]+)$'), 'project'),
+        (re.compile(r'^/rest/stats/project/([^/]+)/version/([^/]+)/'
+                    r'contributor/([^/]+)/([^/]+)$'), 'user_stats'),
+        (re.compile(r'^/rest/project/([^/]+)/version/([^/]+)/'
+                    r'contributors/([^/]+)$'), 'contributors'),
+        (re.compile(r'^/language/list$'), 'language_list'),
+        (re.compile(r'^/language/view/([^/]+)$'), 'language_members'),
+    ]
+    control_routes = {
+        '/_fake/counters': '_get_counters',
+        '/_fake/reset': '_reset_counters',
+    }
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        if path in self.control_routes:
+            return getattr(self, self.control_routes[path])()
+        server.count_request()
+        if server.latency:
+            time.sleep(random.uniform(0.5, 1.5) * server.latency)
+        if server.error_rate and random.random() < server.error_rate:
+            server.count_error()
+            return self._send(503, b'', 'text/plain')
+        for pattern, name in self.routes:
+            match = pattern.match(path)
+            if match:
+                return getattr(self, '_get_' + name)(*match.groups())
+        self._send(404, b'', 'text/plain')
+
+    def _send(self, status, body, content_type):
+        etag = None
+        if status == 200:
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                status, body = 304, b''
+        if ('gzip' in self.headers.get('Accept-Encoding', '') and body):
+            buf = io.BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+                f.write(body)
+            body = buf.getvalue()
+            encoding = 'gzip'
+        else:
+            encoding = None
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path.split('?')[0] not in self.control_routes:
+            self.server.count_bytes(len(body))
+
+    def _send_json(self, data):
+        self._send(200, json.dumps(data).encode('utf-8'), 'application/json')
+
+    def _send_html(self, html):
+        self._send(200, html.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def _get_counters(self):
+        server = self.server
+        self._send(200, json.dumps({'requests': server.requests,
+                                    'errors': server.errors,
+                                    'bytes_sent': server.bytes_sent})
+                   .encode('utf-8'), 'application/json')
+
+    def _reset_counters(self):
+        self.server.reset_counters()
+        self._send(200, b'{}', 'application/json')
+
+    def _get_projects(self):
+        self._send_json([{'id': project, 'status': 'ACTIVE'}
+                         for project in self.server.data.projects])
+
+    def _get_project(self, project):
+        if project not in self.server.data.projects:
+            return self._send(404, b'', 'text/plain')
+        self._send_json({'id': project,
+                         'iterations': [{'id': version} for version
+                                        in self.server.data.versions]})
+
+    def _get_user_stats(self, project, version, user, date_range):
+        self._send_json(self.server.data.user_stats(user, project, version,
+                                                    date_range))
+
+    def _get_contributors(self, project, version, date_range):
+        self._send_json(self.server.data.contributors(project, version,
+                                                      date_range))
+
+    def _get_language_list(self):
+        self._send_html(_language_list_html(self.server.data))
+
+    def _get_language_members(self, lang):
+        if lang not in self.server.data.members:
+            return self._send(404, b'', 'text/plain')
+        self._send_html(_language_members_html(self.server.data, lang))
+
+
+class FakeZanataServer(socketserver.ThreadingMixIn,
+                       BaseHTTPServer.HTTPServer):
+    """Threaded HTTP server with request counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address, data, latency=0.0, error_rate=0.0):
+        BaseHTTPServer.HTTPServer.__init__(self, address, FakeZanataHandler)
+        self.data = data
+        self.latency = latency
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self.reset_counters()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.bytes_sent = 0
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def count_bytes(self, size):
+        with self._lock:
+            self.bytes_sent += size
+
+    @property
+    def url(self):
+        return 'http://%s:%d/' % self.server_address[:2]
+
+    def start(self):
+        """Serve requests in a background thread."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+def add_data_arguments(parser):
+    parser.add_argument("--users", type=int, default=1000,
+                        help="Number of users. Default: 1000")
+    parser.add_argument("--languages", type=int, default=50,
+                        help="Number of language teams. Default: 50")
+    parser.add_argument("--projects", type=int, default=60,
+                        help="Number of projects. Default: 60")
+    parser.add_argument("--versions", type=int, default=3,
+                        choices=range(1, len(VERSIONS) + 1),
+                        help="Number of valid versions per project. "
+                             "Default: 3")
+    parser.add_argument("--activity", type=float, default=0.05,
+                        help="Ratio of users active in a project version. "
+                             "Default: 0.05")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed of the generated data. Default: 0")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Average response latency in seconds. "
+                             "Default: 0")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Ratio of requests answered with 503. "
+                             "Default: 0")
+
+
+def make_data(options):
+    return FakeZanataData(users=options.users, languages=options.languages,
+                          projects=options.projects,
+                          versions=options.versions,
+                          activity=options.activity, seed=options.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument("--host", default='127.0.0.1',
+                        help="Address to listen on. Default: 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="Port to listen on. Default: 8080")
+    add_data_arguments(parser)
+    options = parser.parse_args()
+
+    server = FakeZanataServer((options.host, options.port),
+                              make_data(options),
+                              latency=options.latency,
+                              error_rate=options.error_rate)
+    print('Serving fake Zanata on %s' % server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
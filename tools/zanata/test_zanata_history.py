@@ -0,0 +1,122 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of which runs the history database queries."""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import zanata_history
+
+PERIOD = ('2017-01-01', '2017-03-31')
+TEAMS = {'ja': {'translators': ['alice'], 'reviewers': ['alice']},
+         'de': {'translators': ['bob'], 'reviewers': []}}
+
+
+class HistoryStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.store = zanata_history.HistoryStore(
+            os.path.join(self.tmpdir, 'history.sqlite'))
+        self.addCleanup(self.store.close)
+
+    def add_run(self, stats, lang=None, project=None, units=True,
+                teams=TEAMS, period=PERIOD):
+        """Store a run of (user, lang, project, translated) stats."""
+        params = {'start_date': period[0], 'end_date': period[1],
+                  'lang': lang, 'project': project}
+        run = zanata_history.Run(period[0], period[1], params, teams)
+        users = {}
+        for user, user_lang, unit_project, translated in stats:
+            if units:
+                run.units.append((user, user_lang, unit_project, 'master',
+                                  translated, 0, 0))
+            users[(user, user_lang)] = (
+                users.get((user, user_lang), 0) + translated)
+        self.store.add_run(run, [
+            {'user_id': user, 'lang': user_lang, 'translated': translated,
+             'approved': 0, 'rejected': 0}
+            for (user, user_lang), translated in sorted(users.items())])
+
+    def translated(self, **kwargs):
+        columns, rows, partial = self.store.query(**kwargs)
+        return [row[:2 + len(kwargs.get('group_by', ()))] + row[-3:-2]
+                for row in rows], partial
+
+    def test_latest_run_of_a_period(self):
+        self.add_run([('alice', 'ja', 'nova', 1)])
+        self.add_run([('alice', 'ja', 'nova', 2)])
+        self.assertEqual(([PERIOD + (2,)], []), self.translated())
+
+    def test_run_limited_to_a_language(self):
+        self.add_run([('alice', 'ja', 'nova', 3), ('bob', 'de', 'nova', 4)])
+        self.add_run([('alice', 'ja', 'nova', 5)], lang=['ja'])
+        self.assertEqual(([PERIOD + (7,)], []), self.translated())
+        self.assertEqual(([PERIOD + (4,)], []), self.translated(lang='de'))
+        self.assertEqual(([PERIOD + (5,)], []), self.translated(lang='ja'))
+
+    def test_run_limited_to_a_project(self):
+        self.add_run([('alice', 'ja', 'nova', 3),
+                      ('alice', 'ja', 'horizon', 4)])
+        self.add_run([('alice', 'ja', 'nova', 5)], project=['nova'])
+        self.assertEqual(([PERIOD + ('horizon', 4), PERIOD + ('nova', 3)],
+                          []),
+                         self.translated(group_by=['project']))
+        self.assertEqual(([PERIOD + (5,)], []),
+                         self.translated(project='nova'))
+
+    def test_run_without_units(self):
+        self.add_run([('alice', 'ja', 'nova', 3)])
+        self.add_run([('alice', 'ja', 'nova', 5)], units=False)
+        self.assertEqual(([PERIOD + (5,)], []), self.translated())
+        self.assertEqual(([PERIOD + ('nova', 3)], []),
+                         self.translated(group_by=['project']))
+
+    def test_run_without_activity(self):
+        self.add_run([('alice', 'ja', 'nova', 3)])
+        self.add_run([])
+        self.assertEqual(([], []), self.translated(group_by=['project']))
+
+    def test_run_without_members(self):
+        self.add_run([('alice', 'ja', 'nova', 3)])
+        self.add_run([('alice', 'ja', 'nova', 5)], teams=None)
+        self.assertEqual(([PERIOD + (3,)], []),
+                         self.translated(role='reviewers'))
+
+    def test_partial_period_is_reported(self):
+        other = ('2017-04-01', '2017-06-30')
+        self.add_run([('alice', 'ja', 'nova', 3)], lang=['ja'])
+        self.add_run([('bob', 'de', 'nova', 4)], period=other)
+        self.assertEqual(([PERIOD + (3,), other + (4,)], [PERIOD]),
+                         self.translated())
+        self.assertEqual(([other + (4,)], []), self.translated(last=1))
+
+    def test_many_periods(self):
+        # More periods than the default limit of 999 SQL variables.
+        start = datetime.date(2017, 1, 1)
+        periods = [((start + datetime.timedelta(days)).isoformat(),) * 2
+                   for days in range(1000)]
+        for period in periods:
+            self.add_run([('alice', 'ja', 'nova', 1)], period=period)
+        columns, rows, partial = self.store.query()
+        self.assertEqual([period + (1,) for period in periods],
+                         [row[:2] + row[-3:-2] for row in rows])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of resuming stats runs from the journal."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import zanata_journal
+
+PARAMS = {'start_date': '2016-01-01', 'end_date': '2016-06-30'}
+STATS = {'amotoki': {'ja': {'translated': 1}}}
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'journal.jsonl')
+
+    def open(self, resume=True):
+        journal = zanata_journal.Journal(self.path, PARAMS, resume=resume)
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_resume(self):
+        journal = self.open(resume=False)
+        journal.record(('horizon', 'master', 'amotoki'),
+                       ('2016-01-01', '2016-06-30'), STATS)
+        journal.close()
+        journal = self.open()
+        work = (('horizon', 'master', 'amotoki'),
+                ('2016-01-01', '2016-06-30'))
+        self.assertIn(work, journal)
+        self.assertEqual(STATS, journal.get(*work))
+
+    def test_resume_after_truncated_line(self):
+        journal = self.open(resume=False)
+        journal.record(('horizon', 'master', 'amotoki'),
+                       ('2016-01-01', '2016-06-30'), STATS)
+        journal.close()
+        with open(self.path, 'ab') as f:
+            f.write(b'{"unit": ["nova", "mas')
+
+        journal = self.open()
+        journal.record(('nova', 'master', 'amotoki'),
+                       ('2016-01-01', '2016-06-30'), STATS)
+        journal.close()
+        journal = self.open()
+        for project in ('horizon', 'nova'):
+            self.assertIn(((project, 'master', 'amotoki'),
+                           ('2016-01-01', '2016-06-30')), journal)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(3, len(f.read().splitlines()))
+
+    def test_mismatched_params(self):
+        self.open(resume=False).close()
+        self.assertRaises(zanata_journal.JournalMismatch,
+                          zanata_journal.Journal, self.path,
+                          dict(PARAMS, end_date='2016-12-31'), resume=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of the team roster loader and its user index."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import zanata_roster
+
+TEAM_YAML = b'''ja:
+  language: Japanese
+  translators: [amotoki, 12345, both]
+  reviewers: [amotoki]
+  coordinators: [amotoki]
+de:
+  language: German
+  translators: [both]
+  reviewers: [both]
+'''
+
+
+class RosterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'translation_team.yaml')
+        with open(self.path, 'wb') as f:
+            f.write(TEAM_YAML)
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+
+    def load(self):
+        return zanata_roster.load_roster(self.path, cache_dir=self.cache_dir)
+
+    def test_teams(self):
+        roster = self.load()
+        self.assertEqual({'language': 'Japanese',
+                          'translators': ['amotoki', '12345', 'both'],
+                          'reviewers': ['amotoki'],
+                          'coordinators': ['amotoki']},
+                         roster.teams['ja'])
+        self.assertEqual([], roster.teams['de']['coordinators'])
+
+    def test_user_index(self):
+        roster = self.load()
+        self.assertEqual(set([('ja', 'translators'), ('de', 'translators'),
+                              ('de', 'reviewers')]),
+                         roster.user_roles['both'])
+        # A numeric ID is indexed as a string.
+        self.assertIn('12345', roster)
+        self.assertNotIn(12345, roster)
+        self.assertNotIn('nobody', roster)
+
+    def test_role_lookups(self):
+        roster = self.load()
+        self.assertEqual(['de', 'ja'], roster.languages_of('both'))
+        self.assertEqual(['de'], roster.languages_of('both', 'reviewers'))
+        self.assertEqual([], roster.languages_of('nobody'))
+        self.assertTrue(roster.has_role('both', 'reviewers'))
+        self.assertTrue(roster.has_role('both', 'reviewers', 'de'))
+        self.assertFalse(roster.has_role('both', 'reviewers', 'ja'))
+        self.assertFalse(roster.has_role('both', 'coordinators'))
+
+    def test_cached_roster_is_the_same(self):
+        first = self.load()
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+        second = self.load()
+        self.assertEqual(first.teams, second.teams)
+        self.assertEqual(first.user_roles, second.user_roles)
+
+    def test_changed_file_is_reloaded(self):
+        self.load()
+        with open(self.path, 'ab') as f:
+            f.write(b'fr:\n  language: French\n  translators: [new]\n')
+        self.assertEqual(set([('fr', 'translators')]),
+                         self.load().user_roles['new'])
+
+    def test_corrupted_cache_is_ignored(self):
+        self.load()
+        for name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, name), 'w') as f:
+                f.write('not json')
+        self.assertIn('amotoki', self.load())
+
+
+if __name__ == '__main__':
+    unittest.main()
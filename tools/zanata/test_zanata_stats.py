@@ -0,0 +1,136 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of splitting a stats run into shards and merging them."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import six
+
+import zanata_stats
+
+PARAMS = {'start_date': '2017-01-01', 'end_date': '2017-01-31',
+          'project': None, 'lang': None, 'window': None}
+
+
+class InShardTest(unittest.TestCase):
+
+    units = [(project, version, user)
+             for project in ('nova', 'horizon', u'\u65e5\u672c')
+             for version in ('master', 'stable/ocata')
+             for user in ['user%d' % i for i in range(50)]]
+
+    def test_every_unit_in_exactly_one_shard(self):
+        for count in (1, 2, 3, 7):
+            for unit in self.units:
+                self.assertEqual(
+                    1, sum(zanata_stats.in_shard(unit, (number, count))
+                           for number in range(1, count + 1)), unit)
+
+    def test_units_are_spread_over_shards(self):
+        for number in (1, 2, 3):
+            self.assertTrue(any(zanata_stats.in_shard(unit, (number, 3))
+                                for unit in self.units))
+
+    def test_version_units(self):
+        users = ['user%d' % i for i in range(50)]
+        shards = [zanata_stats._version_units('nova', 'master', users,
+                                              (number, 3))
+                  for number in (1, 2, 3)]
+        self.assertEqual(
+            sorted(zanata_stats._version_units('nova', 'master', users)),
+            sorted(sum(shards, [])))
+
+
+class MergeShardFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write_shard(self, shard, stats, params=PARAMS):
+        users = {}
+        units = []
+        for user_id, lang, translated in stats:
+            user = zanata_stats._make_user(user_id, lang)
+            user['translated'] = translated
+            users[(user_id, lang)] = user
+            units.append((user_id, lang, 'nova', 'master', translated, 0, 0))
+        path = os.path.join(self.tmpdir, '%d-%d-%d.json'
+                            % (shard + (len(os.listdir(self.tmpdir)),)))
+        zanata_stats.write_shard_file(users, path, shard, params, units)
+        return path
+
+    def test_merge(self):
+        paths = [self.write_shard((1, 2), [('alice', 'ja', 3),
+                                           ('bob', 'de', 1)]),
+                 self.write_shard((2, 2), [('alice', 'ja', 4),
+                                           ('alice', 'de', 2)])]
+        users, params, units = zanata_stats.merge_shard_files(paths)
+        self.assertEqual(PARAMS, params)
+        self.assertEqual({('alice', 'ja'): 7, ('alice', 'de'): 2,
+                          ('bob', 'de'): 1},
+                         dict((key, user['translated'])
+                              for key, user in users.items()))
+        self.assertEqual(0, users[('alice', 'ja')]['approved'])
+        self.assertEqual([('alice', 'de', 'nova', 'master', 2, 0, 0),
+                          ('alice', 'ja', 'nova', 'master', 3, 0, 0),
+                          ('alice', 'ja', 'nova', 'master', 4, 0, 0),
+                          ('bob', 'de', 'nova', 'master', 1, 0, 0)],
+                         sorted(units))
+
+    def test_shard_file_without_units(self):
+        paths = [self.write_shard((1, 2), [('alice', 'ja', 3)]),
+                 self.write_shard((2, 2), [('bob', 'ja', 4)])]
+        with open(paths[1]) as f:
+            data = json.load(f)
+        del data['units']
+        with open(paths[1], 'w') as f:
+            json.dump(data, f)
+        users, params, units = zanata_stats.merge_shard_files(paths)
+        self.assertEqual(2, len(users))
+        self.assertIsNone(units)
+
+    def test_duplicate_shard(self):
+        paths = [self.write_shard((1, 2), []),
+                 self.write_shard((1, 2), []),
+                 self.write_shard((2, 2), [])]
+        six.assertRaisesRegex(self, ValueError, 'given twice',
+                              zanata_stats.merge_shard_files, paths)
+
+    def test_missing_shards(self):
+        paths = [self.write_shard((2, 3), [])]
+        six.assertRaisesRegex(self, ValueError, 'Missing shards: 1/3, 3/3',
+                              zanata_stats.merge_shard_files, paths)
+
+    def test_shard_of_other_run(self):
+        paths = [self.write_shard((1, 2), []),
+                 self.write_shard((2, 2), [],
+                                  dict(PARAMS, end_date='2017-02-28'))]
+        six.assertRaisesRegex(self, ValueError, 'different run',
+                              zanata_stats.merge_shard_files, paths)
+
+    def test_different_shard_count(self):
+        paths = [self.write_shard((1, 2), []),
+                 self.write_shard((2, 3), []),
+                 self.write_shard((3, 3), [])]
+        six.assertRaisesRegex(self, ValueError, 'different run',
+                              zanata_stats.merge_shard_files, paths)
+
+
+if __name__ == '__main__':
+    unittest.main()
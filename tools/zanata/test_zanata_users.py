@@ -0,0 +1,73 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of the YAML output of zanata_users.py."""
+
+from collections import OrderedDict
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import yaml
+
+import zanata_users
+
+
+def _roster():
+    return OrderedDict([
+        ('ja', {'language': u'\u65e5\u672c\u8a9e',
+                'translators': [u'amotoki', u'12345'],
+                'reviewers': [u'amotoki']}),
+        ('de', {'language': u'Deutsch',
+                'translators': [u'both']}),
+    ])
+
+
+class SaveToYamlTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'translation_team.yaml')
+
+    def read(self):
+        with io.open(self.path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_save_to_yaml(self):
+        zanata_users.save_to_yaml(_roster(), self.path)
+        text = self.read()
+        self.assertTrue(text.startswith(u'# Use the order'))
+        self.assertIn(u'\u65e5\u672c\u8a9e', text)
+        self.assertLess(text.index(u'ja:'), text.index(u'de:'))
+        self.assertEqual(dict(_roster()), yaml.safe_load(text))
+
+    def test_update_yaml(self):
+        zanata_users.save_to_yaml(_roster(), self.path)
+        data = _roster()
+        self.assertEqual([], zanata_users.update_yaml(data, self.path))
+
+        data['de']['reviewers'] = [u'both']
+        data['fr'] = {'language': u'Fran\xe7ais', 'translators': [u'x']}
+        del data['ja']
+        self.assertEqual(['ja', 'de', 'fr'],
+                         zanata_users.update_yaml(data, self.path))
+        text = self.read()
+        self.assertTrue(text.startswith(u'# Use the order'))
+        self.assertEqual(dict(data), yaml.safe_load(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks of the date windows used by the window store."""
+
+import unittest
+
+import zanata_windows
+
+
+class SplitDateRangeTest(unittest.TestCase):
+
+    def test_weeks_clipped_at_both_ends(self):
+        # 2017-01-04 is a Wednesday and 2017-01-24 a Tuesday.
+        self.assertEqual([('2017-01-04', '2017-01-08'),
+                          ('2017-01-09', '2017-01-15'),
+                          ('2017-01-16', '2017-01-22'),
+                          ('2017-01-23', '2017-01-24')],
+                         zanata_windows.split_date_range(
+                             '2017-01-04', '2017-01-24', 'week'))
+
+    def test_whole_weeks(self):
+        self.assertEqual([('2017-01-02', '2017-01-08'),
+                          ('2017-01-09', '2017-01-15')],
+                         zanata_windows.split_date_range(
+                             '2017-01-02', '2017-01-15', 'week'))
+
+    def test_week_across_year_boundary(self):
+        # 2016-12-26 is a Monday.
+        self.assertEqual([('2016-12-26', '2017-01-01'),
+                          ('2017-01-02', '2017-01-03')],
+                         zanata_windows.split_date_range(
+                             '2016-12-26', '2017-01-03', 'week'))
+
+    def test_months_across_year_boundary(self):
+        self.assertEqual([('2016-11-15', '2016-11-30'),
+                          ('2016-12-01', '2016-12-31'),
+                          ('2017-01-01', '2017-01-31'),
+                          ('2017-02-01', '2017-02-10')],
+                         zanata_windows.split_date_range(
+                             '2016-11-15', '2017-02-10', 'month'))
+
+    def test_single_day(self):
+        self.assertEqual([('2017-03-01', '2017-03-01')],
+                         zanata_windows.split_date_range(
+                             '2017-03-01', '2017-03-01', 'month'))
+
+    def test_empty_range(self):
+        self.assertEqual([], zanata_windows.split_date_range(
+            '2017-03-02', '2017-03-01'))
+
+    def test_unknown_window(self):
+        self.assertRaises(ValueError, zanata_windows.split_date_range,
+                          '2017-01-01', '2017-02-01', 'year')
+
+
+class IsWholeWindowTest(unittest.TestCase):
+
+    def test_week(self):
+        self.assertTrue(zanata_windows.is_whole_window(
+            ('2017-01-09', '2017-01-15'), 'week'))
+        self.assertTrue(zanata_windows.is_whole_window(
+            ('2016-12-26', '2017-01-01'), 'week'))
+        self.assertFalse(zanata_windows.is_whole_window(
+            ('2017-01-10', '2017-01-15'), 'week'))
+        self.assertFalse(zanata_windows.is_whole_window(
+            ('2017-01-09', '2017-01-14'), 'week'))
+
+    def test_month(self):
+        self.assertTrue(zanata_windows.is_whole_window(
+            ('2016-12-01', '2016-12-31'), 'month'))
+        self.assertTrue(zanata_windows.is_whole_window(
+            ('2016-02-01', '2016-02-29'), 'month'))
+        self.assertFalse(zanata_windows.is_whole_window(
+            ('2017-02-01', '2017-02-27'), 'month'))
+        self.assertFalse(zanata_windows.is_whole_window(
+            ('2017-01-15', '2017-01-31'), 'month'))
+
+    def test_only_edges_of_a_split_are_clipped(self):
+        ranges = zanata_windows.split_date_range('2016-11-15', '2017-02-10',
+                                                 'month')
+        self.assertEqual([False, True, True, False],
+                         [zanata_windows.is_whole_window(r, 'month')
+                          for r in ranges])
+
+
+if __name__ == '__main__':
+    unittest.main()
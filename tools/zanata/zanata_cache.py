@@ -0,0 +1,157 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+# Eviction removes entries down to this fraction of the maximum size,
+# so that the cache directory is not walked again on every later set().
+LOW_WATER_RATIO = 0.8
+
+
+class ResponseCache(object):
+    """Persistent on-disk cache of Zanata REST responses.
+
+    Each response body is stored in a file whose name is the SHA-1 hash
+    of the request URI. A file starts with a one-line JSON header
+    followed by the raw body. Entries expire after ``ttl`` seconds
+    unless they were stored as immutable (e.g. statistics for a date
+    range which is already closed). When the total size exceeds
+    ``max_size`` bytes, the least recently used entries are removed
+    until it is below ``LOW_WATER_RATIO`` of it.
+    """
+
+    def __init__(self, cache_dir, ttl=DEFAULT_TTL,
+                 max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._total_size = None
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def _path(self, uri):
+        key = hashlib.sha1(uri.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, uri):
+        """Return the cached body for uri or None."""
+        path = self._path(uri)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline().decode('utf-8'))
+                data = f.read()
+        except (IOError, OSError, ValueError):
+            return None
+        now = time.time()
+        if header.get('uri') != uri:
+            return None
+        if (not header.get('immutable') and
+                now - header.get('stored', 0) > self.ttl):
+            self._remove(path)
+            return None
+        try:
+            # Record the access time for the LRU eviction.
+            os.utime(path, (now, os.stat(path).st_mtime))
+        except OSError:
+            pass
+        return data
+
+    def set(self, uri, data, immutable=False):
+        """Store data (bytes) for uri."""
+        path = self._path(uri)
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # Created by another thread in the meantime.
+                pass
+        header = json.dumps({'uri': uri, 'stored': time.time(),
+                             'immutable': bool(immutable)})
+        fd, tmp_path = tempfile.mkstemp(dir=dirname)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header.encode('utf-8') + b'\n')
+            f.write(data)
+        old_size = self._size(path)
+        os.rename(tmp_path, path)
+        self._account(self._size(path) - old_size)
+
+    def _size(self, path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _remove(self, path):
+        size = self._size(path)
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        self._account(-size)
+
+    def _iter_entries(self):
+        for dirpath, dirnames, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st
+
+    def _account(self, delta):
+        with self._lock:
+            if self._total_size is None:
+                self._total_size = sum(st.st_size for path, st
+                                       in self._iter_entries())
+            else:
+                self._total_size += delta
+            needs_eviction = self._total_size > self.max_size
+        if needs_eviction:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries if over max_size.
+
+        Entries are removed until the total size is at the low-water
+        mark.
+        """
+        with self._lock:
+            if (self._total_size is not None and
+                    self._total_size <= self.max_size):
+                # Another thread has evicted entries in the meantime.
+                return
+            entries = sorted(self._iter_entries(),
+                             key=lambda entry: entry[1].st_atime)
+            total = sum(st.st_size for path, st in entries)
+            low_water = self.max_size * LOW_WATER_RATIO
+            if total <= self.max_size:
+                low_water = total
+            for path, st in entries:
+                if total <= low_water:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= st.st_size
+            self._total_size = total
@@ -0,0 +1,320 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import threading
+import time
+
+import zanata_metrics
+
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_TIMEOUT = 60
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_MAX_RATE = 100.0
+
+# Status codes which indicate a transient server-side condition.
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class RetriesExhausted(Exception):
+    """A request kept failing with transient errors."""
+
+    def __init__(self, uri, error):
+        super(RetriesExhausted, self).__init__(
+            'Giving up on %s: %s' % (uri, error))
+        self.uri = uri
+        self.error = error
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket rate limiter."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = burst or max(1.0, self.rate)
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def adjust_rate(self, factor=1.0, step=0.0, min_rate=None,
+                    max_rate=None):
+        """Multiply the rate by factor, add step and clamp it atomically.
+
+        Returns the new rate.
+        """
+        with self._lock:
+            rate = self.rate * factor + step
+            if min_rate is not None:
+                rate = max(min_rate, rate)
+            if max_rate is not None:
+                rate = min(max_rate, rate)
+            self.rate = rate
+            return rate
+
+    def acquire(self):
+        """Block until a token is available and consume it."""
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RequestScheduler(object):
+    """Rate limiting and retrying of requests.
+
+    Requests failing with a connection error, a timeout or one of
+    RETRY_STATUS_CODES are retried with exponential backoff and full
+    jitter. Retries across all requests are limited by a retry budget
+    (a ratio of the number of requests sent) so that a struggling
+    server is not hammered further.
+
+    In adaptive mode the outcomes of requests are counted over windows
+    of adjust_interval seconds, and the rate limit is adjusted once at
+    the end of each window: it is halved if more than max_error_rate of
+    the attempts failed with throttling or server errors, lowered by
+    10% if most responses were slower than target_latency, and raised
+    additively for each successful request otherwise. An occasional
+    transient error is retried without slowing down the whole run.
+    The adaptive rate never exceeds max_rate, which defaults to the
+    initial rate if one is given and to DEFAULT_MAX_RATE otherwise.
+    """
+
+    def __init__(self, rate=None, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=0.5, backoff_max=60.0, retry_budget=0.2,
+                 adaptive=False, min_rate=1.0, max_rate=None,
+                 target_latency=2.0, adjust_interval=1.0,
+                 max_error_rate=0.2):
+        if max_rate is None:
+            max_rate = rate or DEFAULT_MAX_RATE
+        if adaptive and not rate:
+            rate = min_rate * 10
+        self.bucket = TokenBucket(rate) if rate else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget
+        self.adaptive = adaptive
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.adjust_interval = adjust_interval
+        self.max_error_rate = max_error_rate
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+        # Outcomes of attempts in the current adjustment window.
+        self._window_start = time.time()
+        self._ok = self._slow = self._errors = 0
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _can_retry(self, attempt):
+        if attempt >= self.max_retries:
+            return False
+        with self._lock:
+            # A few retries are always allowed so that a run does not
+            # fail because of an error in its very first requests.
+            if self.retries >= max(self.max_retries,
+                                   self.retry_budget * self.requests):
+                return False
+            self.retries += 1
+            return True
+
+    def _record(self, error=False, slow=False):
+        """Count the outcome of an attempt and adjust the rate if due."""
+        if not (self.adaptive and self.bucket):
+            return
+        with self._lock:
+            if error:
+                self._errors += 1
+            elif slow:
+                self._slow += 1
+            else:
+                self._ok += 1
+            now = time.time()
+            if now - self._window_start < self.adjust_interval:
+                return
+            total = self._errors + self._slow + self._ok
+            if self._errors > self.max_error_rate * total:
+                factor, step = 0.5, 0.0
+            elif self._slow > self._ok:
+                factor, step = 0.9, 0.0
+            else:
+                factor, step = 1.0, 0.5 * self._ok
+            self._window_start = now
+            self._ok = self._slow = self._errors = 0
+            self.bucket.adjust_rate(factor, step, self.min_rate,
+                                    self.max_rate)
+
+    def call(self, uri, send):
+        """Call send() with rate limiting and retries.
+
+        send must return a requests response. RetriesExhausted is
+        raised if a transient error persists.
+        """
+        # requests is slow to import, so it is only imported by code
+        # sending requests and not by tools merely using the constants.
+        import requests
+
+        attempt = 0
+        while True:
+            if self.bucket:
+                self.bucket.acquire()
+            with self._lock:
+                self.requests += 1
+            start = time.time()
+            retry_after = None
+            try:
+                resp = send()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                if resp.status_code not in RETRY_STATUS_CODES:
+                    self._record(slow=(time.time() - start >
+                                       self.target_latency))
+                    return resp
+                error = requests.HTTPError(
+                    '%s Error for url: %s' % (resp.status_code, uri),
+                    response=resp)
+                retry_after = _parse_retry_after(
+                    resp.headers.get('Retry-After'))
+            self._record(error=True)
+            if not self._can_retry(attempt):
+                raise RetriesExhausted(uri, error)
+            time.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
+
+
+def _parse_retry_after(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ZanataClient(object):
+    """HTTP client shared by the Zanata tools.
+
+    All requests go through a single requests session so that
+    connections to translate.openstack.org are kept alive and reused
+    instead of paying a TCP and TLS handshake for every call.
+    """
+    user_agents = [
+        'Mozilla/5.0 (X11; Ubuntu; Linux x86_64) Gecko/20100101 Firefox/32.0',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_6) AppleWebKit/537.78.2',
+        'Mozilla/5.0 (Windows NT 6.3; WOW64) Gecko/20100101 Firefox/32.0',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X) Chrome/37.0.2062.120',
+        'Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; rv:11.0) like Gecko'
+    ]
+
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 timeout=DEFAULT_TIMEOUT, scheduler=None, metrics=None):
+        """Create a client.
+
+        :param max_connections: maximum number of connections kept open
+            to a single host. Callers sending requests from more threads
+            than this block until a pooled connection is free.
+        :param timeout: socket timeout in seconds for each request.
+        :param scheduler: RequestScheduler used to rate limit and retry
+            requests. By default failed requests are retried without
+            rate limiting.
+        :param metrics: zanata_metrics.Metrics recording every request
+            attempt. A new one is created by default.
+        """
+        import requests
+        from requests import adapters
+
+        self.timeout = timeout
+        self.scheduler = scheduler or RequestScheduler()
+        self.metrics = metrics or zanata_metrics.Metrics()
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        adapter = adapters.HTTPAdapter(pool_connections=max_connections,
+                                       pool_maxsize=max_connections,
+                                       pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, uri, headers=None):
+        """Send a GET request and return the response.
+
+        RetriesExhausted is raised if a transient error persists after
+        retries, and requests.HTTPError for any other HTTP error status.
+        """
+        headers = dict(headers or {})
+        attempts = []
+
+        def send():
+            headers['User-Agent'] = random.choice(ZanataClient.user_agents)
+            retry = bool(attempts)
+            attempts.append(uri)
+            start = time.time()
+            try:
+                resp = self.session.get(uri, headers=headers,
+                                        timeout=self.timeout)
+            except Exception:
+                self.metrics.record_request(uri, time.time() - start,
+                                            error=True, retry=retry)
+                raise
+            # Content-Length is the size on the wire before decoding.
+            size = int(resp.headers.get('Content-Length') or
+                       len(resp.content))
+            self.metrics.record_request(uri, time.time() - start, size,
+                                        error=resp.status_code >= 400,
+                                        retry=retry)
+            return resp
+
+        resp = self.scheduler.call(uri, send)
+        resp.raise_for_status()
+        return resp
+
+    def close(self):
+        self.session.close()
+
+
+_shared_client = None
+
+
+def get_client():
+    """Return the client shared within the process."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = ZanataClient()
+    return _shared_client
+
+
+def configure(max_connections=DEFAULT_MAX_CONNECTIONS,
+              timeout=DEFAULT_TIMEOUT, **scheduler_options):
+    """Replace the shared client with one using the given limits.
+
+    Extra keyword arguments are passed to RequestScheduler.
+    """
+    global _shared_client
+    if _shared_client is not None:
+        _shared_client.close()
+    _shared_client = ZanataClient(
+        max_connections=max_connections, timeout=timeout,
+        scheduler=RequestScheduler(**scheduler_options))
+    return _shared_client
@@ -0,0 +1,219 @@
+#!/usr/bin/python
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import array
+
+import numpy as np
+
+AXES = ('user', 'lang', 'project', 'version')
+METRICS = ('translated', 'approved', 'rejected')
+# Version label of projects without iterations, for which
+# zanata_get_project_versions yields None.
+NO_VERSION = '(none)'
+
+
+def branch_of(version):
+    """Group a Zanata version ID into 'master' or 'stable'.
+
+    Projects without versions are kept apart as NO_VERSION.
+    """
+    if version is None or version == NO_VERSION:
+        return NO_VERSION
+    return 'master' if version.startswith('master') else 'stable'
+
+
+class StatsCube(object):
+    """Contributor stats indexed by (user, lang, project, version, metric).
+
+    Cells are kept as sparse coordinate records in compact arrays since
+    most users contribute to few languages, projects and versions.
+    Rollups sum the records along any set of axes with numpy instead of
+    looping over Python dicts.
+    """
+
+    def __init__(self):
+        self.labels = dict((axis, []) for axis in AXES)
+        self._index = dict((axis, {}) for axis in AXES)
+        self._coords = dict((axis, array.array('l')) for axis in AXES)
+        self._values = dict((metric, array.array('l')) for metric in METRICS)
+
+    def __len__(self):
+        return len(self._values[METRICS[0]])
+
+    def _label_index(self, axis, label):
+        index = self._index[axis]
+        if label not in index:
+            index[label] = len(self.labels[axis])
+            self.labels[axis].append(label)
+        return index[label]
+
+    def add(self, user, lang, project, version, **metrics):
+        """Record metrics (translated, approved, rejected) of one cell."""
+        if version is None:
+            version = NO_VERSION
+        for axis, label in zip(AXES, (user, lang, project, version)):
+            self._coords[axis].append(self._label_index(axis, label))
+        for metric in METRICS:
+            self._values[metric].append(int(metrics.get(metric, 0)))
+
+    def add_user_stats(self, project, version, user, statisticdata):
+        """Record a Zanata contributor stats response for a user.
+
+        Contributions to every language are recorded, not only to the
+        language team of the user.
+        """
+        if not statisticdata:
+            return
+        for lang, stat in statisticdata.get(user, {}).items():
+            self.add(user, lang, project, version,
+                     **dict((metric, stat.get(metric, 0))
+                            for metric in METRICS))
+
+    def coords(self, axis):
+        coords = self._coords[axis]
+        return np.frombuffer(coords, dtype=coords.typecode)
+
+    def values(self):
+        """Return a (cells, metrics) array of the recorded values."""
+        return np.column_stack([
+            np.frombuffer(self._values[metric],
+                          dtype=self._values[metric].typecode)
+            for metric in METRICS]).reshape(len(self), len(METRICS))
+
+    def rollup(self, *axes, **groupers):
+        """Sum metrics over all axes except the given ones.
+
+        Keyword arguments map an axis to a function which groups its
+        labels, e.g. ``rollup('lang', version=branch_of)`` gives totals
+        per language split into master and stable branches.
+
+        Returns a tuple of the labels of each kept axis and an array of
+        shape (len(labels[0]), ..., len(METRICS)).
+        """
+        keep = list(axes) + [axis for axis in groupers if axis not in axes]
+        labels = []
+        codes = []
+        for axis in keep:
+            coords = self.coords(axis)
+            if axis in groupers:
+                grouped = [groupers[axis](label)
+                           for label in self.labels[axis]]
+                axis_labels = sorted(set(grouped))
+                group_index = dict((label, i)
+                                   for i, label in enumerate(axis_labels))
+                mapping = np.array([group_index[label] for label in grouped],
+                                   dtype=np.int64)
+                coords = mapping[coords] if len(coords) else coords
+            else:
+                axis_labels = list(self.labels[axis])
+            labels.append(axis_labels)
+            codes.append(coords)
+        shape = tuple(len(axis_labels) for axis_labels in labels)
+        size = int(np.prod(shape))
+        values = self.values()
+        if keep:
+            flat = (np.ravel_multi_index(codes, shape) if len(self)
+                    else np.zeros(0, dtype=np.int64))
+        else:
+            flat = np.zeros(len(self), dtype=np.int64)
+        result = np.column_stack([
+            np.bincount(flat, weights=values[:, i], minlength=size)
+            for i in range(len(METRICS))]).astype(np.int64)
+        return labels, result.reshape(shape + (len(METRICS),))
+
+    def pivot(self, row_axis, column_axis, metric='translated'):
+        """Return (row labels, column labels, 2-D array) of a metric."""
+        (rows, columns), result = self.rollup(row_axis, column_axis)
+        return rows, columns, result[:, :, METRICS.index(metric)]
+
+    def leaderboard(self, axis, metric='translated', limit=None):
+        """Return (label, value) pairs along axis by descending metric."""
+        (labels,), result = self.rollup(axis)
+        totals = result[:, METRICS.index(metric)]
+        order = np.argsort(-totals, kind='mergesort')
+        if limit is not None:
+            order = order[:limit]
+        return [(labels[i], int(totals[i])) for i in order]
+
+    def save(self, path):
+        """Save the cube into a numpy .npz file."""
+        data = {}
+        for axis in AXES:
+            data['labels_' + axis] = np.array(self.labels[axis],
+                                              dtype=np.str_)
+            data['coords_' + axis] = self.coords(axis)
+        data['values'] = self.values()
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **data)
+
+    @classmethod
+    def load(cls, path):
+        cube = cls()
+        with np.load(path) as data:
+            for axis in AXES:
+                cube.labels[axis] = [str(label) for label
+                                     in data['labels_' + axis]]
+                cube._index[axis] = dict(
+                    (label, i) for i, label in enumerate(cube.labels[axis]))
+                cube._coords[axis] = array.array(
+                    'l', data['coords_' + axis].tolist())
+            values = data['values']
+            for i, metric in enumerate(METRICS):
+                cube._values[metric] = array.array(
+                    'l', values[:, i].tolist())
+        return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Show rollups of a stats cube saved by zanata_stats.')
+    parser.add_argument("-b", "--by",
+                        action='append', default=[], choices=AXES,
+                        help="Axis to keep. Can be specified multiple times.")
+    parser.add_argument("--branch",
+                        action='store_true',
+                        help="Split versions into master and stable.")
+    parser.add_argument("-m", "--metric",
+                        default='translated', choices=METRICS,
+                        help="Metric to sort by. Default: translated")
+    parser.add_argument("-n", "--limit",
+                        type=int,
+                        help="Show only the first N rows.")
+    parser.add_argument("cube_file",
+                        help="Cube file written by zanata_stats.py")
+    options = parser.parse_args()
+
+    cube = StatsCube.load(options.cube_file)
+    groupers = {'version': branch_of} if options.branch else {}
+    labels, result = cube.rollup(*options.by, **groupers)
+    # Only the non-empty cells are visited, not the cross-product of
+    # the kept axes.
+    shape = tuple(len(axis_labels) for axis_labels in labels)
+    result = result.reshape(-1, len(METRICS))
+    cells = np.nonzero(result.any(axis=-1))[0]
+    order = np.argsort(-result[cells, METRICS.index(options.metric)],
+                       kind='mergesort')
+    cells = cells[order[:options.limit]]
+    indexes = np.unravel_index(cells, shape) if shape else ()
+    keep = options.by + [axis for axis in groupers if axis not in options.by]
+    print('\t'.join(keep + list(METRICS)))
+    for n, cell in enumerate(cells):
+        keys = [labels[i][index[n]] for i, index in enumerate(indexes)]
+        print('\t'.join(keys + [str(value) for value in result[cell]]))
+
+
+if __name__ == '__main__':
+    main()
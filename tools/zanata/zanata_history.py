@@ -0,0 +1,252 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import json
+import sqlite3
+
+METRICS = ('translated', 'approved', 'rejected')
+GROUPS = ('user', 'lang', 'project', 'version')
+ROLES = ('translators', 'reviewers', 'coordinators')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    params TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_period ON runs (start_date, end_date);
+CREATE TABLE IF NOT EXISTS user_stats (
+    run_id INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    translated INTEGER NOT NULL,
+    approved INTEGER NOT NULL,
+    rejected INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS user_stats_run ON user_stats (run_id);
+CREATE INDEX IF NOT EXISTS user_stats_user ON user_stats (user);
+CREATE INDEX IF NOT EXISTS user_stats_lang ON user_stats (lang);
+CREATE TABLE IF NOT EXISTS unit_stats (
+    run_id INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    project TEXT NOT NULL,
+    version TEXT,
+    translated INTEGER NOT NULL,
+    approved INTEGER NOT NULL,
+    rejected INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS unit_stats_run ON unit_stats (run_id);
+CREATE INDEX IF NOT EXISTS unit_stats_user ON unit_stats (user);
+CREATE INDEX IF NOT EXISTS unit_stats_lang ON unit_stats (lang);
+CREATE INDEX IF NOT EXISTS unit_stats_project ON unit_stats (project);
+CREATE TABLE IF NOT EXISTS members (
+    run_id INTEGER NOT NULL,
+    lang TEXT NOT NULL,
+    user TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_lang_role ON members (lang, role);
+"""
+
+
+class Run(object):
+    """Metadata and per project version stats of a zanata_stats run.
+
+    It is passed to get_zanata_stats like a StatsCube, which calls
+    add_user_stats for every retrieved (project, version, user) unit.
+    """
+
+    def __init__(self, start_date, end_date, params, language_teams=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.params = params
+        self.language_teams = language_teams or {}
+        self.units = []
+
+    def add_user_stats(self, project, version, user, statisticdata):
+        if not statisticdata:
+            return
+        for lang, stat in statisticdata.get(user, {}).items():
+            self.units.append((user, lang, project, version) +
+                              tuple(int(stat.get(metric, 0))
+                                    for metric in METRICS))
+
+    def members(self):
+        for lang, team in self.language_teams.items():
+            for role in ROLES:
+                for user in team.get(role, []):
+                    yield lang, user, role
+
+
+def _covers(selected, value):
+    """Return whether a run limited to selected has all stats of value.
+
+    selected is the --lang or --project list of the run (None for all),
+    value the filter of a query (None for all).
+    """
+    return selected is None or (value is not None and value in selected)
+
+
+class HistoryStore(object):
+    """SQLite database of the results of zanata_stats runs.
+
+    Each run is kept with its date range (the period), so that results
+    of many runs can be compared without querying Zanata again. When
+    several runs cover the same period, queries use the latest one which
+    has the stats asked for.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add_run(self, run, stats):
+        """Store a run and its per-user stats. Returns the run ID."""
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO runs (created_at, start_date, end_date, params) '
+                'VALUES (?, ?, ?, ?)',
+                (datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+                 run.start_date, run.end_date,
+                 json.dumps(run.params, sort_keys=True)))
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                'INSERT INTO user_stats VALUES (?, ?, ?, ?, ?, ?)',
+                ((run_id, stat['user_id'], stat['lang']) +
+                 tuple(stat[metric] for metric in METRICS)
+                 for stat in stats))
+            self.conn.executemany(
+                'INSERT INTO unit_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                ((run_id,) + unit for unit in run.units))
+            self.conn.executemany(
+                'INSERT INTO members VALUES (?, ?, ?, ?)',
+                ((run_id,) + member for member in run.members()))
+        return run_id
+
+    def _has_rows(self, table, run_id):
+        return self.conn.execute(
+            'SELECT EXISTS (SELECT 1 FROM %s WHERE run_id = ?)' % table,
+            (run_id,)).fetchone()[0]
+
+    def _has_units(self, run_id):
+        # A run without any activity has no unit rows either.
+        return (self._has_rows('unit_stats', run_id) or
+                not self.conn.execute(
+                    'SELECT EXISTS (SELECT 1 FROM user_stats '
+                    'WHERE run_id = ? AND %s)'
+                    % ' OR '.join('%s > 0' % metric for metric in METRICS),
+                    (run_id,)).fetchone()[0])
+
+    def select_runs(self, lang=None, project=None, per_unit=False,
+                    role=False):
+        """Choose the run to query for each period.
+
+        A run limited with --lang or --project only has part of the
+        stats of its period, a run merged from old shard files has no
+        per project version stats, and a run merged without the user
+        list has no members. The latest run of a period which has the
+        stats asked for is used. If only runs with part of the stats
+        are left, the latest of them is used and the period is reported
+        as partial.
+
+        Returns the run IDs and the sorted list of partial periods.
+        """
+        complete = {}
+        partial = {}
+        for run_id, start_date, end_date, params in self.conn.execute(
+                'SELECT id, start_date, end_date, params FROM runs '
+                'ORDER BY id'):
+            if per_unit and not self._has_units(run_id):
+                continue
+            if role and not self._has_rows('members', run_id):
+                continue
+            params = json.loads(params)
+            period = (start_date, end_date)
+            if (_covers(params.get('lang'), lang) and
+                    _covers(params.get('project'), project)):
+                complete[period] = run_id
+            else:
+                partial[period] = run_id
+        partial_periods = sorted(set(partial) - set(complete))
+        run_ids = (list(complete.values()) +
+                   [partial[period] for period in partial_periods])
+        return run_ids, partial_periods
+
+    def query(self, group_by=(), user=None, lang=None, project=None,
+              role=None, last=None):
+        """Sum stats per period and the group_by columns.
+
+        Stats are taken per project version when a project is given or
+        grouped by, and per user (attributed to language teams as in
+        the CSV output) otherwise. role limits users to the members
+        with the role in the language team of the stats. The runs are
+        chosen with select_runs.
+
+        Returns the column names, a list of rows ordered by period and
+        the periods only covered by runs with part of the stats.
+        """
+        per_unit = (project is not None or
+                    'project' in group_by or 'version' in group_by)
+        table = 'unit_stats' if per_unit else 'user_stats'
+        run_ids, partial_periods = self.select_runs(lang, project, per_unit,
+                                                    bool(role))
+        # The chosen runs are joined from a temporary table rather than
+        # bound one by one, which would hit the limit on the number of
+        # SQL variables once there are many bucketed runs.
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS '
+                              'selected_runs (id INTEGER PRIMARY KEY)')
+            self.conn.execute('DELETE FROM temp.selected_runs')
+            self.conn.executemany(
+                'INSERT INTO temp.selected_runs VALUES (?)',
+                [(run_id,) for run_id in run_ids])
+        where = []
+        params = []
+        for column, value in (('user', user), ('lang', lang),
+                              ('project', project)):
+            if value is not None:
+                where.append('s.%s = ?' % column)
+                params.append(value)
+        if role:
+            where.append('EXISTS (SELECT 1 FROM members m '
+                         'WHERE m.run_id = s.run_id AND m.lang = s.lang '
+                         'AND m.user = s.user AND m.role = ?)')
+            params.append(role)
+        groups = ['s.%s' % column for column in group_by]
+        sql = ('SELECT r.start_date, r.end_date%s, %s '
+               'FROM %s s JOIN temp.selected_runs t ON t.id = s.run_id '
+               'JOIN runs r ON r.id = s.run_id '
+               'WHERE %s GROUP BY r.start_date, r.end_date%s '
+               'ORDER BY r.start_date, r.end_date%s'
+               % (''.join(', ' + group for group in groups),
+                  ', '.join('SUM(s.%s)' % metric for metric in METRICS),
+                  table, ' AND '.join(where) or '1',
+                  ''.join(', ' + group for group in groups),
+                  ''.join(', ' + group for group in groups)))
+        rows = self.conn.execute(sql, params).fetchall()
+        if last:
+            periods = set(sorted(set(row[:2] for row in rows))[-last:])
+            rows = [row for row in rows if row[:2] in periods]
+            partial_periods = [period for period in partial_periods
+                               if period in periods]
+        columns = (['start_date', 'end_date'] + list(group_by) +
+                   list(METRICS))
+        return columns, rows, partial_periods
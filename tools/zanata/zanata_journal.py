@@ -0,0 +1,112 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import os
+
+
+class JournalMismatch(Exception):
+    """The journal was written by a run with different parameters."""
+
+
+class Journal(object):
+    """Append-only journal of completed stats work units.
+
+    The first line records the parameters of the run. Each following
+    line records the stats retrieved for one (project, version, user)
+    unit and date range. A run resumed from the journal replays these
+    lines and only retrieves the remaining units.
+    """
+
+    def __init__(self, path, params, resume=False):
+        """Open a journal.
+
+        :param path: path of the journal file.
+        :param params: dict of run parameters. When resuming, it must
+            match the parameters recorded in the journal.
+        :param resume: if True, entries of an existing journal are
+            loaded. Otherwise the journal is started from scratch.
+        """
+        self.path = path
+        self.completed = {}
+        params = json.loads(json.dumps(params))
+        if resume and os.path.exists(path):
+            self._replay(params)
+            self._truncate_partial_line()
+            self._file = io.open(path, 'a', encoding='utf-8')
+        else:
+            self._file = io.open(path, 'w', encoding='utf-8')
+            self._write(params)
+
+    def _replay(self, params):
+        with io.open(self.path, 'r', encoding='utf-8') as f:
+            header = f.readline()
+            if json.loads(header) != params:
+                raise JournalMismatch(
+                    'Journal %s was written with different parameters: %s'
+                    % (self.path, header.strip()))
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line may be truncated by a crash.
+                    continue
+                self.completed[self._key(entry['unit'],
+                                         entry['range'])] = entry['stats']
+
+    def _truncate_partial_line(self):
+        """Cut off a last line left half-written by a crash.
+
+        Otherwise the first record appended on resume would be joined
+        onto it and lost as well.
+        """
+        with io.open(self.path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                size = min(4096, pos)
+                pos -= size
+                f.seek(pos)
+                newline = f.read(size).rfind(b'\n')
+                if newline >= 0:
+                    pos += newline + 1
+                    break
+            if pos != end:
+                f.truncate(pos)
+
+    @staticmethod
+    def _key(unit, date_range):
+        return tuple(unit) + tuple(date_range)
+
+    def _write(self, entry):
+        self._file.write(u'%s\n' % json.dumps(entry))
+        self._file.flush()
+
+    def __contains__(self, work):
+        unit, date_range = work
+        return self._key(unit, date_range) in self.completed
+
+    def get(self, unit, date_range):
+        return self.completed[self._key(unit, date_range)]
+
+    def record(self, unit, date_range, stats):
+        """Append the stats of a completed unit."""
+        self.completed[self._key(unit, date_range)] = stats
+        self._write({'unit': list(unit), 'range': list(date_range),
+                     'stats': stats})
+
+    def close(self, remove=False):
+        self._file.close()
+        if remove:
+            os.remove(self.path)
@@ -0,0 +1,267 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import json
+import re
+import sys
+import threading
+import time
+
+# Upper bounds of the latency histogram buckets in milliseconds.
+LATENCY_BUCKETS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Patterns to collapse request URIs into endpoints, most specific first.
+ENDPOINT_PATTERNS = [
+    (re.compile(r'/rest/stats/project/[^/]+/version/[^/]+/'
+                r'contributor/[^/]+/[^/]+$'),
+     'stats/project/{project}/version/{version}/contributor/{user}/{range}'),
+    (re.compile(r'/rest/project/[^/]+/version/[^/]+/contributors/[^/]+$'),
+     'project/{project}/version/{version}/contributors/{range}'),
+    (re.compile(r'/rest/projects/p/[^/]+$'), 'projects/p/{project}'),
+    (re.compile(r'/rest/projects$'), 'projects'),
+    (re.compile(r'/language/list$'), 'language/list'),
+    (re.compile(r'/language/view/[^/]+$'), 'language/view/{language}'),
+]
+
+
+def endpoint_of(uri):
+    """Return the endpoint template of a Zanata URI."""
+    path = uri.split('?')[0]
+    for pattern, endpoint in ENDPOINT_PATTERNS:
+        if pattern.search(path):
+            return endpoint
+    return 'other'
+
+
+class _EndpointStats(object):
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def percentile(self, ratio):
+        """Approximate a latency percentile (ms) from the histogram."""
+        threshold = ratio * sum(self.histogram)
+        count = 0
+        for i, bucket_count in enumerate(self.histogram):
+            count += bucket_count
+            if bucket_count and count >= threshold:
+                if i < len(LATENCY_BUCKETS):
+                    return LATENCY_BUCKETS[i]
+                return round(self.latency_max * 1000, 1)
+        return None
+
+    def to_dict(self):
+        buckets = ['<=%dms' % bound for bound in LATENCY_BUCKETS]
+        buckets.append('>%dms' % LATENCY_BUCKETS[-1])
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'bytes': self.bytes,
+            'latency_avg_ms': (round(self.latency_sum * 1000 /
+                                     self.requests, 1)
+                               if self.requests else None),
+            'latency_max_ms': round(self.latency_max * 1000, 1),
+            'latency_p50_ms': self.percentile(0.5),
+            'latency_p95_ms': self.percentile(0.95),
+            'latency_histogram': [{'bucket': bucket, 'count': count}
+                                  for bucket, count
+                                  in zip(buckets, self.histogram)],
+        }
+
+
+class Metrics(object):
+    """Thread-safe request metrics collected per endpoint."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, uri):
+        # Caller must hold self._lock.
+        endpoint = endpoint_of(uri)
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = _EndpointStats()
+        return self._endpoints[endpoint]
+
+    def record_request(self, uri, latency, size=0, error=False,
+                       retry=False):
+        """Record one HTTP request attempt."""
+        index = bisect.bisect_left(LATENCY_BUCKETS, latency * 1000)
+        with self._lock:
+            stats = self._stats(uri)
+            stats.requests += 1
+            stats.bytes += size
+            stats.latency_sum += latency
+            stats.latency_max = max(stats.latency_max, latency)
+            stats.histogram[index] += 1
+            if error:
+                stats.errors += 1
+            if retry:
+                stats.retries += 1
+
+    def record_cache_hit(self, uri):
+        with self._lock:
+            self._stats(uri).cache_hits += 1
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = dict((endpoint, stats.to_dict()) for endpoint, stats
+                             in self._endpoints.items())
+        elapsed = time.time() - self.started
+        total = dict((key, sum(stats[key] for stats in endpoints.values()))
+                     for key in ('requests', 'errors', 'retries',
+                                 'cache_hits', 'bytes'))
+        total['elapsed_seconds'] = round(elapsed, 3)
+        total['requests_per_second'] = (round(total['requests'] / elapsed, 1)
+                                        if elapsed else None)
+        return {'total': total, 'endpoints': endpoints}
+
+    def write(self, path):
+        """Write the metrics into a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4, sort_keys=True)
+
+
+class Progress(object):
+    """Progress line with throughput and ETA written to stderr.
+
+    The total amount of work is planned before the work starts. It can
+    still be lowered while the run progresses (e.g. users missing from
+    the contributor list of a version are not queried with --bulk) by
+    calling plan with a negative count.
+    """
+
+    def __init__(self, label, interval=1.0, stream=None):
+        self.label = label
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.planned = 0
+        self.done = 0
+        self.started = time.time()
+        self._last_output = 0
+        self._tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+
+    def plan(self, count=1):
+        self.planned += count
+
+    def update(self, count=1):
+        self.done += count
+        now = time.time()
+        if now - self._last_output >= self.interval:
+            self._last_output = now
+            self._output(now)
+
+    def _output(self, now):
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed else 0
+        remaining = max(self.planned - self.done, 0)
+        eta = '%ds' % (remaining / rate) if rate else '-'
+        line = ('%s: %d/%d done, %.1f/s, ETA %s'
+                % (self.label, self.done, self.planned, rate, eta))
+        if self._tty:
+            self.stream.write('\r%s\x1b[K' % line)
+        else:
+            self.stream.write('%s\n' % line)
+        self.stream.flush()
+
+    def finish(self):
+        self._output(time.time())
+        if self._tty:
+            self.stream.write('\n')
+
+
+class Profiler(object):
+    """cProfile profiler of a run including its worker threads.
+
+    cProfile only profiles the thread which enabled it, so functions
+    run in pool threads are wrapped to be profiled by a profiler of
+    their thread. All profiles are merged when the stats are dumped.
+    """
+
+    def __init__(self):
+        # Imported here as pstats is slow to import.
+        import cProfile
+
+        self._cProfile = cProfile
+        self._main = cProfile.Profile()
+        self._thread = None
+        self._profiles = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self._thread = threading.current_thread()
+        self._main.enable()
+
+    def disable(self):
+        self._main.disable()
+
+    def _thread_profile(self):
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = self._local.profile = self._cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        return profile
+
+    def wrap(self, func):
+        """Return func profiled in whichever thread calls it."""
+        def wrapper(*args):
+            if threading.current_thread() is self._thread:
+                return func(*args)
+            profile = self._thread_profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Since Python 3.12, a profiler sees all threads and
+                # only one can be active.
+                return func(*args)
+            try:
+                return func(*args)
+            finally:
+                profile.disable()
+        return wrapper
+
+    def wrap_iter(self, iterable):
+        """Return an iterator profiling the work done by iterable.
+
+        ThreadPool consumes the iterable of its tasks in a thread of
+        its own.
+        """
+        iterator = iter(iterable)
+        end = object()
+        next_item = self.wrap(lambda: next(iterator, end))
+        while True:
+            item = next_item()
+            if item is end:
+                return
+            yield item
+
+    def dump_stats(self, path):
+        import pstats
+
+        stats = pstats.Stats(self._main)
+        for profile in self._profiles:
+            stats.add(profile)
+        stats.dump_stats(path)
@@ -0,0 +1,138 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import tempfile
+
+import yaml
+
+ROLES = ('translators', 'reviewers', 'coordinators')
+CACHE_FORMAT = 2
+
+# The C loader (libyaml) is an order of magnitude faster if available.
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def _default_cache_dir():
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                        os.path.join(os.path.expanduser('~'), '.cache'),
+                        'openstack-i18n')
+
+
+class Roster(object):
+    """Language teams loaded from translation_team.yaml.
+
+    teams maps a language code to a dict of the language name and the
+    lists of translators, reviewers and coordinators, with all Zanata
+    IDs as strings. user_roles is an inverted index from a Zanata user
+    ID to the set of (language code, role) pairs of the user, so that
+    membership and roles are looked up in O(1) and a translator
+    belonging to several language teams is kept in all of them.
+    """
+
+    def __init__(self, content):
+        self.teams = {}
+        self.user_roles = {}
+        for language_code, team_info in content.items():
+            team = {'language': team_info.get('language')}
+            for role in ROLES:
+                # Zanata ID which only consists of numbers is loaded as
+                # an integer unless it is quoted. Ensure to stringify.
+                members = [str(i) for i in team_info.get(role) or []]
+                team[role] = members
+                for user_id in members:
+                    self.user_roles.setdefault(user_id, set()).add(
+                        (language_code, role))
+            self.teams[language_code] = team
+
+    def __contains__(self, user_id):
+        return user_id in self.user_roles
+
+    def languages_of(self, user_id, role='translators'):
+        """Return the language codes where the user has the role."""
+        return sorted(language_code for language_code, user_role
+                      in self.user_roles.get(user_id, ())
+                      if user_role == role)
+
+    def has_role(self, user_id, role, language_code=None):
+        """Return whether the user has the role (in the language)."""
+        if language_code is not None:
+            return (language_code, role) in self.user_roles.get(user_id, ())
+        return any(user_role == role for user_language, user_role
+                   in self.user_roles.get(user_id, ()))
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _load_cache(cache_path):
+    """Return the cached data, or None if it is missing or unusable.
+
+    The cache is JSON rather than a pickle: the cache directory may be
+    shared, and loading a pickle written by someone else would run
+    arbitrary code.
+    """
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('format') != CACHE_FORMAT:
+        return None
+    return cached
+
+
+def load_roster(path, cache_dir=None):
+    """Load a Roster, reusing a cached copy while the file is unchanged.
+
+    The parsed content is cached as JSON under cache_dir (by default
+    $XDG_CACHE_HOME/openstack-i18n) and is valid while the file has
+    the same modification time and size, or the same SHA-1 hash.
+    """
+    cache_dir = cache_dir or _default_cache_dir()
+    abspath = os.path.abspath(path)
+    cache_path = os.path.join(
+        cache_dir,
+        'roster-%s.json' % hashlib.sha1(abspath.encode('utf-8'))
+        .hexdigest())
+    st = os.stat(abspath)
+    stamp = [st.st_mtime, st.st_size]
+
+    cached = _load_cache(cache_path)
+    if cached and cached.get('stamp') == stamp:
+        return Roster(cached['content'])
+
+    data = _read_file(abspath)
+    digest = hashlib.sha1(data).hexdigest()
+    if cached and cached.get('sha1') == digest:
+        content = cached['content']
+    else:
+        content = yaml.load(data, Loader=SafeLoader) or {}
+
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'format': CACHE_FORMAT, 'stamp': stamp,
+                       'sha1': digest, 'content': content}, f)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError, TypeError, ValueError):
+        # The cache is only an optimization. TypeError is raised for
+        # YAML content which cannot be represented in JSON.
+        pass
+    return Roster(content)
@@ -14,52 +14,82 @@
 # limitations under the License.
 
 import argparse
+import collections
 import csv
 import datetime
-import io
 import json
 import operator
-import random
+import os
 import re
 import sys
+import zlib
 
-from oslo_log import log as logging
 import six
-import yaml
+
+import zanata_cache
+import zanata_client
+import zanata_journal
+import zanata_metrics
+import zanata_windows
 
 ZANATA_URI = 'https://translate.openstack.org/rest/%s'
-LOG = logging.getLogger(__name__)
+
+
+class _LazyLogger(object):
+    """Logger importing oslo.log on first use.
+
+    oslo.log is slow to import and is not needed to show the help or to
+    run the merge and query subcommands.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._logger = None
+
+    def __getattr__(self, attr):
+        if self._logger is None:
+            from oslo_log import log as logging
+            self._logger = logging.getLogger(self._name)
+        return getattr(self._logger, attr)
+
+
+LOG = _LazyLogger(__name__)
 
 ZANATA_VERSION_PATTERN = re.compile(r'^(master[-,a-z]*|stable-[a-z]+)$')
 
 
 class ZanataUtility(object):
     """Utilities to invoke Zanata REST API."""
-    user_agents = [
-        'Mozilla/5.0 (X11; Ubuntu; Linux x86_64) Gecko/20100101 Firefox/32.0',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_6) AppleWebKit/537.78.2',
-        'Mozilla/5.0 (Windows NT 6.3; WOW64) Gecko/20100101 Firefox/32.0',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X) Chrome/37.0.2062.120',
-        'Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; rv:11.0) like Gecko'
-    ]
+
+    def __init__(self, client=None, cache=None):
+        self.client = client or zanata_client.get_client()
+        self.cache = cache
 
     def read_uri(self, uri, headers):
         try:
-            headers['User-Agent'] = random.choice(ZanataUtility.user_agents)
-            req = six.moves.urllib.request.Request(url=uri, headers=headers)
-            fd = six.moves.urllib.request.urlopen(req)
-            raw = fd.read()
-            fd.close()
-            return raw
+            return self.client.get(uri, headers).content
+        except zanata_client.RetriesExhausted:
+            # Skipping the data point would silently produce wrong
+            # numbers, so stop the run instead.
+            raise
         except Exception as e:
             print('exception happen', e)
             LOG.warning('Error "%(error)s" while reading uri %(uri)s',
                         {'error': e, 'uri': uri})
 
-    def read_json_from_uri(self, uri):
+    def read_json_from_uri(self, uri, immutable=False):
+        data = self.cache.get(uri) if self.cache else None
+        if data is not None:
+            self.client.metrics.record_cache_hit(uri)
+            return json.loads(data.decode('utf-8'))
         try:
             data = self.read_uri(uri, {'Accept': 'application/json'})
-            return json.loads(data)
+            result = json.loads(data)
+            if self.cache:
+                self.cache.set(uri, data, immutable=immutable)
+            return result
+        except zanata_client.RetriesExhausted:
+            raise
         except Exception as e:
             LOG.warning('Error "%(error)s" parsing json from uri %(uri)s',
                         {'error': e, 'uri': uri})
@@ -90,21 +120,34 @@ class ZanataUtility(object):
         uri = ZANATA_URI % ('stats/project/%s/version/%s/contributor/%s/%s..%s'
                             % (project_id, iteration_id, zanata_user_id,
                                start_date, end_date))
-        return self.read_json_from_uri(uri)
+        # Stats for a date range which has already ended never change.
+        return self.read_json_from_uri(
+            uri, immutable=zanata_windows.is_closed_range(end_date))
+
+    def zanata_get_version_contributors(self, project_id, iteration_id,
+                                        start_date, end_date):
+        """Return IDs of users who contributed to a version in a range.
+
+        None is returned if the contributor list cannot be retrieved.
+        """
+        uri = ZANATA_URI % ('project/%s/version/%s/contributors/%s..%s'
+                            % (project_id, iteration_id,
+                               start_date, end_date))
+        contributors = self.read_json_from_uri(
+            uri, immutable=zanata_windows.is_closed_range(end_date))
+        if contributors is None:
+            return None
+        return set(contributor['username'] for contributor in contributors)
 
 
-def _make_language_team(name, team_info):
-    return {
+def _make_language_team(name, team):
+    language_team = {
         'tag': 'language_team',
         'language_code': name,
-        'language': team_info['language'],
-        # Zanata ID which only consists of numbers is a valid ID
-        # and such entry is interpreted as integer unless it is
-        # quoted in the YAML file. Ensure to stringify them.
-        'translators': [str(i) for i in team_info['translators']],
-        'reviewers': [str(i) for i in team_info.get('reviewers', [])],
-        'coordinators': [str(i) for i in team_info.get('coordinators', [])],
     }
+    # Zanata IDs in a zanata_roster.Roster team are already strings.
+    language_team.update(team)
+    return language_team
 
 
 def _make_user(user_id, language_code):
@@ -121,70 +164,281 @@ def read_language_team_yaml(translation_team_uri, lang_list):
     LOG.debug('Process list of language team from uri: %s',
               translation_team_uri)
 
-    content = yaml.safe_load(io.open(translation_team_uri, 'r'))
+    # PyYAML is only needed to read the team list.
+    import zanata_roster
+
+    teams = zanata_roster.load_roster(translation_team_uri).teams
     language_teams = {}
 
     if lang_list:
         lang_notfound = [lang_code for lang_code in lang_list
-                         if lang_code not in content]
+                         if lang_code not in teams]
         if lang_notfound:
             print('Language %s not tound in %s.' %
                   (', '.join(lang_notfound),
                    translation_team_uri))
             sys.exit(1)
 
-    for lang_code, team_info in content.items():
+    for lang_code, team in teams.items():
         if lang_list and lang_code not in lang_list:
             continue
-        language_teams[lang_code] = _make_language_team(lang_code, team_info)
+        language_teams[lang_code] = _make_language_team(lang_code, team)
 
     return language_teams
 
 
-def get_zanata_stats(start_date, end_date, language_teams, project_list):
+def _version_units(project_id, version, users, shard=None):
+    """Return the (project, version, user) units of a version."""
+    return [(project_id, version, user_id) for user_id in users
+            if not shard or in_shard((project_id, version, user_id), shard)]
+
+
+def in_shard(unit, shard):
+    """Return whether a (project, version, user) unit is in a shard.
+
+    shard is a tuple of a 1-based shard number and the number of shards.
+    Units are assigned by a stable hash, so every run splits the work
+    the same way.
+    """
+    number, count = shard
+    key = u'/'.join(six.text_type(i) for i in unit).encode('utf-8')
+    return (zlib.crc32(key) & 0xffffffff) % count == number - 1
+
+
+def _map_work_units(func, units, jobs):
+    """Apply func to each work unit, optionally with a bounded thread pool.
+
+    Results are yielded as they complete, so the caller merges them
+    from a single thread and no locking of the counters is needed.
+    """
+    if jobs <= 1:
+        for unit in units:
+            yield func(unit)
+        return
+    from multiprocessing import pool
+
+    workers = pool.ThreadPool(jobs)
+    try:
+        for result in workers.imap_unordered(func, units):
+            yield result
+    finally:
+        workers.terminate()
+        workers.join()
+
+
+def _add_user_stats(user, statisticdata):
+    if not statisticdata:
+        return
+    user_contributes = statisticdata[user['user_id']]
+    if (user['lang'] in user_contributes):
+        user_stat = user_contributes[user['lang']]
+        user['translated'] += int(user_stat['translated'])
+        user['approved'] += int(user_stat['approved'])
+        user['rejected'] += int(user_stat['rejected'])
+
+
+def get_zanata_stats(start_date, end_date, language_teams, project_list,
+                     jobs=1, cache=None, bulk=False, window_store=None,
+                     window='week', journal=None, cube=None,
+                     progress=None, shard=None, history=None,
+                     bucket=None, series=None, bucket_history=None,
+                     profiler=None):
+    """Retrieve stats of translators in language_teams from Zanata.
+
+    Returns a dict from (user ID, language code) to the stats of the
+    user. With bucket ('week' or 'month'), the date range is split into
+    buckets which are retrieved concurrently like other work, and the
+    stats of each bucket are also stored into the series dict, keyed by
+    the (start, end) of the bucket. bucket_history maps the (start, end)
+    of each bucket to its zanata_history.Run, which is filled like
+    history. A zanata_metrics.Profiler given as profiler also profiles
+    the work done in worker threads.
+    """
     print('Getting Zanata contributors statistics (from %s to %s) ...' %
           (start_date, end_date))
-    zanataUtil = ZanataUtility()
+    zanataUtil = ZanataUtility(cache=cache)
+    # A translator can belong to several language teams, so stats are
+    # kept per (user, language) while each user is queried only once.
     users = {}
+    user_stats = collections.OrderedDict()
     for language_code in language_teams:
         language_team = language_teams[language_code]
         for user in language_team['translators']:
-            users[user] = _make_user(user, language_code)
+            users[(user, language_code)] = _make_user(user, language_code)
+            user_stats.setdefault(user, []).append(
+                users[(user, language_code)])
 
     if not project_list:
         project_list = zanataUtil.zanata_get_projects()
-    for project_id in project_list:
-        for version in zanataUtil.zanata_get_project_versions(project_id):
-            for user_id in users:
-                user = users.get(user_id)
-                print('Getting %(project_id)s %(version)s '
-                      'for user %(user_id)s %(user_lang)s'
-                      % {'project_id': project_id,
-                         'version': version,
-                         'user_id': user_id,
-                         'user_lang': user['lang']})
-                statisticdata = zanataUtil.zanata_get_user_stats(
-                    project_id, version, user_id, start_date, end_date)
-                if statisticdata:
-                    user_contributes = statisticdata[user_id]
-                    if (user['lang'] in user_contributes):
-                        user_stat = user_contributes[user['lang']]
-                        user['translated'] += int(user_stat['translated'])
-                        user['approved'] += int(user_stat['approved'])
-                        user['rejected'] += int(user_stat['rejected'])
+
+    # With a window store, the range is split into windows so that
+    # windows fetched by earlier runs are summed up locally. Only whole
+    # calendar windows are stored; the clipped first and last ranges
+    # move with the dates of the run and are always retrieved.
+    if window_store or bucket:
+        date_ranges = zanata_windows.split_date_range(start_date, end_date,
+                                                      bucket or window)
+    else:
+        date_ranges = [(start_date, end_date)]
+    stored_ranges = set()
+    if window_store:
+        stored_ranges = set(
+            date_range for date_range in date_ranges
+            if zanata_windows.is_whole_window(date_range, bucket or window))
+    if bucket and series is not None:
+        for date_range in date_ranges:
+            series[date_range] = dict((key, _make_user(*key))
+                                      for key in users)
+
+    def fetch(work):
+        unit, date_range = work
+        project_id, version, user_id = unit
+        if journal and work in journal:
+            return unit, date_range, journal.get(unit, date_range), False
+        if date_range in stored_ranges:
+            statisticdata = window_store.get(unit, date_range)
+            if statisticdata is not None:
+                return unit, date_range, statisticdata, False
+        LOG.debug('Getting %(project_id)s %(version)s '
+                  'for user %(user_id)s %(user_lang)s',
+                  {'project_id': project_id,
+                   'version': version,
+                   'user_id': user_id,
+                   'user_lang': ','.join(user['lang'] for user
+                                         in user_stats[user_id])})
+        statisticdata = zanataUtil.zanata_get_user_stats(
+            project_id, version, user_id, date_range[0], date_range[1])
+        return unit, date_range, statisticdata, True
+
+    def get_contributors(project_id, version):
+        return zanataUtil.zanata_get_version_contributors(
+            project_id, version, start_date, end_date)
+
+    # Versions are listed up front, one request per project, so that
+    # the total amount of work is known for the ETA of the progress.
+    versions = [(project_id, version) for project_id in project_list
+                for version in zanataUtil.zanata_get_project_versions(
+                    project_id)]
+    progress = progress or zanata_metrics.Progress('Zanata stats')
+    progress.plan(len(date_ranges) * sum(
+        len(_version_units(project_id, version, user_stats, shard))
+        for project_id, version in versions))
+
+    def iter_works():
+        for project_id, version in versions:
+            units = _version_units(project_id, version, user_stats, shard)
+            contributors = None
+            if bulk:
+                contributors = get_contributors(project_id, version)
+            if contributors is not None:
+                listed = [unit for unit in units if unit[2] in contributors]
+                # Users not in the contributor list are not queried.
+                progress.plan((len(listed) - len(units)) * len(date_ranges))
+                units = listed
+            for unit in units:
+                for date_range in date_ranges:
+                    yield unit, date_range
+
+    works = iter_works()
+    if profiler:
+        fetch = profiler.wrap(fetch)
+        works = profiler.wrap_iter(works)
+    for unit, date_range, statisticdata, fetched in _map_work_units(
+            fetch, works, jobs):
+        if fetched and date_range in stored_ranges:
+            window_store.put(unit, date_range, statisticdata)
+        if fetched and journal:
+            journal.record(unit, date_range, statisticdata)
+        for user in user_stats[unit[2]]:
+            _add_user_stats(user, statisticdata)
+            if bucket and series is not None:
+                _add_user_stats(series[date_range][(user['user_id'],
+                                                    user['lang'])],
+                                statisticdata)
+        if cube is not None:
+            cube.add_user_stats(unit[0], unit[1], unit[2], statisticdata)
+        if history is not None:
+            history.add_user_stats(unit[0], unit[1], unit[2], statisticdata)
+        if bucket_history is not None:
+            bucket_history[date_range].add_user_stats(
+                unit[0], unit[1], unit[2], statisticdata)
+        progress.update()
+    progress.finish()
 
     return users
 
 
 def write_stats_to_file(users, output_file, file_format,
-                        include_no_activities):
-    stats = [user for user in
+                        include_no_activities, run=None):
+    """Write the stats of users into output_file.
+
+    The totals of a user are final only once every work unit has been
+    processed, so this is called when the run finishes. Partial results
+    of an interrupted run live only in the journal (--journal).
+
+    With the sqlite format, the stats are added to the history
+    database output_file as a new run described by run, a
+    zanata_history.Run.
+    """
+    stats = (user for user in
              sorted(users.values(), key=operator.itemgetter('lang', 'user_id'))
-             if _needs_output(include_no_activities, user)]
+             if _needs_output(include_no_activities, user))
+    if file_format == HISTORY_FORMAT:
+        import zanata_history
+
+        store = zanata_history.HistoryStore(output_file)
+        try:
+            run_id = store.add_run(run, stats)
+        finally:
+            store.close()
+        print('Stats has been added to %s as run %d' % (output_file, run_id))
+        return
+    _STATS_WRITERS[file_format](stats, output_file)
+    print('Stats has been written to %s' % output_file)
+
+
+def write_series_to_file(series, output_file, file_format,
+                         include_no_activities, runs=None):
+    """Write the per-bucket stats of users collected with a bucket.
+
+    Each row is the stats of a user in a bucket with the start_date and
+    end_date of the bucket. With the sqlite format, each bucket is added
+    to the history database as a run of its own, described by the
+    zanata_history.Run of the bucket in runs (the bucket_history of
+    get_zanata_stats).
+    """
+    def iter_stats(users):
+        return (user for user in
+                sorted(users.values(),
+                       key=operator.itemgetter('lang', 'user_id'))
+                if _needs_output(include_no_activities, user))
+
+    if file_format == HISTORY_FORMAT:
+        import zanata_history
+
+        store = zanata_history.HistoryStore(output_file)
+        try:
+            for date_range, users in series.items():
+                store.add_run(runs[date_range], iter_stats(users))
+        finally:
+            store.close()
+        print('Stats of %d buckets have been added to %s'
+              % (len(series), output_file))
+        return
+
+    def iter_rows():
+        for (start, end), users in series.items():
+            for user in iter_stats(users):
+                row = collections.OrderedDict([('start_date', start),
+                                               ('end_date', end)])
+                row.update(user)
+                yield row
+
     if file_format == 'csv':
-        _write_stats_to_csvfile(stats, output_file)
+        _write_stats_to_csvfile(iter_rows(), output_file,
+                                ['start_date', 'end_date'] + STATS_COLUMNS)
     else:
-        _write_stats_to_jsonfile(stats, output_file)
+        _STATS_WRITERS[file_format](iter_rows(), output_file)
     print('Stats has been written to %s' % output_file)
 
 
@@ -197,34 +451,238 @@ def _needs_output(include_no_activities, user):
         return False
 
 
-def _write_stats_to_csvfile(stats, output_file):
-    with open(output_file, 'wb') as csvfile:
+def _open_csvfile(output_file):
+    if six.PY2:
+        return open(output_file, 'wb')
+    return open(output_file, 'w', newline='')
+
+
+STATS_COLUMNS = ['user_id', 'lang', 'translated', 'approved', 'rejected']
+
+
+def _write_stats_to_csvfile(stats, output_file, columns=STATS_COLUMNS):
+    with _open_csvfile(output_file) as csvfile:
         writer = csv.writer(csvfile)
-        writer.writerow(['user_id', 'lang',
-                         'translated', 'approved', 'rejected'])
+        writer.writerow(columns)
         for stat in stats:
-            writer.writerow([stat['user_id'], stat['lang'],
-                             stat['translated'], stat['approved'],
-                             stat['rejected']])
+            writer.writerow([stat[column] for column in columns])
 
 
 def _write_stats_to_jsonfile(stats, output_file):
+    # Write the list element by element rather than serializing the
+    # whole list at once. The output is the same as json.dumps(stats,
+    # indent=4).
     with open(output_file, 'w') as f:
-        f.write(json.dumps(stats, indent=4))
+        separator = '[\n'
+        for stat in stats:
+            f.write(separator)
+            f.write('\n'.join('    ' + line for line in
+                              json.dumps(stat, indent=4).split('\n')))
+            separator = ',\n'
+        f.write('[]' if separator == '[\n' else '\n]')
+
+
+def _write_stats_to_jsonlfile(stats, output_file):
+    with open(output_file, 'w') as f:
+        for stat in stats:
+            f.write(json.dumps(stat))
+            f.write('\n')
+
+
+def write_shard_file(users, output_file, shard, params, units=()):
+    """Write the stats of all users of a shard for merge_shard_files.
+
+    units are the per project version stats of the shard, the units of
+    its zanata_history.Run, so that a merged run keeps them.
+    """
+    with open(output_file, 'w') as f:
+        json.dump({'shard': list(shard), 'params': params,
+                   'users': sorted(users.values(),
+                                   key=operator.itemgetter('lang',
+                                                           'user_id')),
+                   'units': sorted(units)},
+                  f, indent=1, sort_keys=True)
+    print('Shard %d/%d has been written to %s' % (shard + (output_file,)))
+
+
+def merge_shard_files(shard_files):
+    """Sum up the stats of shard files written by write_shard_file.
+
+    All shards of one run must be given exactly once. Returns the
+    users, the parameters and the units of the run. The units are None
+    if a shard file does not have them.
+    """
+    users = collections.OrderedDict()
+    units = []
+    params = None
+    seen = {}
+    count = None
+    for path in shard_files:
+        with open(path) as f:
+            data = json.load(f)
+        number, shard_count = data['shard']
+        if params is None:
+            params, count = data['params'], shard_count
+        elif data['params'] != params or shard_count != count:
+            raise ValueError('%s is a shard of a different run: %s'
+                             % (path, data['params']))
+        if number in seen:
+            raise ValueError('Shard %d/%d is given twice: %s and %s'
+                             % (number, count, seen[number], path))
+        seen[number] = path
+        for stat in data['users']:
+            key = (stat['user_id'], stat['lang'])
+            user = users.setdefault(key, _make_user(*key))
+            for metric in ('translated', 'approved', 'rejected'):
+                user[metric] += stat[metric]
+        if units is not None and 'units' in data:
+            units.extend(tuple(unit) for unit in data['units'])
+        else:
+            units = None
+    missing = sorted(set(range(1, (count or 0) + 1)) - set(seen))
+    if missing:
+        raise ValueError('Missing shards: %s'
+                         % ', '.join('%d/%d' % (number, count)
+                                     for number in missing))
+    return users, params, units
+
+
+_STATS_WRITERS = {
+    'csv': _write_stats_to_csvfile,
+    'json': _write_stats_to_jsonfile,
+    'jsonl': _write_stats_to_jsonlfile,
+}
+# Stats are appended to an SQLite database instead of written to a file.
+HISTORY_FORMAT = 'sqlite'
+FORMATS = sorted(list(_STATS_WRITERS) + [HISTORY_FORMAT])
 
 
 def _comma_separated_list(s):
     return s.split(',')
 
 
+def _shard(s):
+    match = re.match(r'^(\d+)/(\d+)$', s)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(
+            'shard must be i/N with 1 <= i <= N: %s' % s)
+    return int(match.group(1)), int(match.group(2))
+
+
+def merge_main(argv):
+    import zanata_history
+
+    parser = argparse.ArgumentParser(
+        prog='%s merge' % os.path.basename(sys.argv[0]),
+        description='Merge shard files written with --shard.')
+    parser.add_argument("-o", "--output-file",
+                        help=("Specify the output file. "
+                              "Default: "
+                              "zanata_stats_output.{csv,json,jsonl}."))
+    parser.add_argument("-f", "--format",
+                        default='csv', choices=FORMATS,
+                        help="Output file format.")
+    parser.add_argument("--include-no-activities",
+                        action='store_true',
+                        help=("If specified, stats for users with no "
+                              "activities are output as well."))
+    parser.add_argument("--user-yaml",
+                        help=("YAML file of the user list of the run. "
+                              "Required with --format sqlite to record "
+                              "the members of the language teams."))
+    parser.add_argument("shard_file", nargs='+',
+                        help="Shard files of all shards of a run")
+    options = parser.parse_args(argv)
+    if options.format == HISTORY_FORMAT and not options.user_yaml:
+        parser.error('--user-yaml is required with --format %s'
+                     % HISTORY_FORMAT)
+
+    try:
+        users, params, units = merge_shard_files(options.shard_file)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    language_teams = None
+    if options.user_yaml:
+        language_teams = read_language_team_yaml(options.user_yaml,
+                                                 params['lang'])
+    run = zanata_history.Run(params['start_date'], params['end_date'],
+                             params, language_teams)
+    if units is None:
+        print('Shard files without per project stats; the merged run '
+              'cannot be queried per project or version.')
+    else:
+        run.units = units
+    write_stats_to_file(users,
+                        options.output_file or
+                        'zanata_stats_output.%s' % options.format,
+                        options.format, options.include_no_activities,
+                        run=run)
+
+
+def query_main(argv):
+    import zanata_history
+
+    parser = argparse.ArgumentParser(
+        prog='%s query' % os.path.basename(sys.argv[0]),
+        description=('Show stats per period from a history database '
+                     'written with --format sqlite.'))
+    parser.add_argument("-u", "--user",
+                        help="Only show stats of this user.")
+    parser.add_argument("-l", "--lang",
+                        help="Only show stats of this language.")
+    parser.add_argument("-p", "--project",
+                        help="Only show stats of this project.")
+    parser.add_argument("-r", "--role",
+                        choices=zanata_history.ROLES,
+                        help=("Only show stats of users with this role in "
+                              "the language team."))
+    parser.add_argument("-g", "--group-by",
+                        type=_comma_separated_list, default=[],
+                        help=("Comma-separated list of columns to group "
+                              "stats by in addition to the period: %s."
+                              % ', '.join(zanata_history.GROUPS)))
+    parser.add_argument("-n", "--last",
+                        type=int,
+                        help="Only show the last N periods.")
+    parser.add_argument("database",
+                        help="History database file")
+    options = parser.parse_args(argv)
+    unknown = set(options.group_by) - set(zanata_history.GROUPS)
+    if unknown:
+        parser.error('unknown --group-by column: %s'
+                     % ', '.join(sorted(unknown)))
+
+    store = zanata_history.HistoryStore(options.database)
+    try:
+        columns, rows, partial_periods = store.query(
+            group_by=options.group_by, user=options.user, lang=options.lang,
+            project=options.project, role=options.role, last=options.last)
+    finally:
+        store.close()
+    for period in partial_periods:
+        sys.stderr.write('Only runs with part of the stats cover %s - %s; '
+                         'the latest of them is shown.\n' % period)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(columns)
+    writer.writerows(rows)
+
+
 def main():
+    if sys.argv[1:2] == ['merge']:
+        return merge_main(sys.argv[2:])
+    if sys.argv[1:2] == ['query']:
+        return query_main(sys.argv[2:])
 
     default_end_date = datetime.datetime.now()
     default_start_date = default_end_date - datetime.timedelta(days=180)
     default_start_date = default_start_date.strftime('%Y-%m-%d')
     default_end_date = default_end_date.strftime('%Y-%m-%d')
 
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(
+        epilog=("Run 'zanata_stats.py merge SHARD_FILE...' to merge the "
+                "files written with --shard, and 'zanata_stats.py query "
+                "DATABASE' to show stats stored with --format sqlite."))
     parser.add_argument("-s", "--start-date",
                         default=default_start_date,
                         help=("Specify the start date. "
@@ -235,7 +693,9 @@ def main():
                               "Default:%s" % default_end_date))
     parser.add_argument("-o", "--output-file",
                         help=("Specify the output file. "
-                              "Default: zanata_stats_output.{csv,json}."))
+                              "Default: "
+                              "zanata_stats_output.{csv,json,jsonl,sqlite}."
+                              " An existing sqlite file is appended to."))
     parser.add_argument("-p", "--project",
                         type=_comma_separated_list,
                         help=("Specify project(s). Comma-separated list. "
@@ -252,22 +712,227 @@ def main():
                               "By default, stats only for users with "
                               "any activities are output."))
     parser.add_argument("-f", "--format",
-                        default='csv', choices=['csv', 'json'],
+                        default='csv', choices=FORMATS,
                         help="Output file format.")
+    parser.add_argument("-j", "--jobs",
+                        type=int, default=1,
+                        help=("Number of concurrent requests to Zanata. "
+                              "Default: 1 (serial)."))
+    parser.add_argument("--max-connections",
+                        type=int,
+                        help=("Maximum number of connections kept open "
+                              "to the Zanata server. "
+                              "Default: the number of jobs."))
+    parser.add_argument("--rate",
+                        type=float,
+                        help=("Maximum number of requests per second. "
+                              "Default: unlimited."))
+    parser.add_argument("--adaptive-rate",
+                        action='store_true',
+                        help=("Adjust the request rate to the latency and "
+                              "error rate observed from the server, up to "
+                              "--rate or %d requests per second." %
+                              zanata_client.DEFAULT_MAX_RATE))
+    parser.add_argument("--max-retries",
+                        type=int, default=zanata_client.DEFAULT_MAX_RETRIES,
+                        help=("Maximum number of retries of a request "
+                              "failing with a transient error. "
+                              "Default: %d" %
+                              zanata_client.DEFAULT_MAX_RETRIES))
+    parser.add_argument("--bulk",
+                        action='store_true',
+                        help=("Retrieve the contributor list once per "
+                              "project version and query stats only for "
+                              "listed users instead of every user."))
+    parser.add_argument("--window-store",
+                        help=("Keep stats per closed calendar window in "
+                              "this directory. Only whole windows not "
+                              "stored by earlier runs are retrieved from "
+                              "Zanata; the partial windows at the start "
+                              "and end dates are retrieved every time. "
+                              "The first run makes one request per "
+                              "(project, version, user) and window, e.g. "
+                              "about 27 times as many as without a store "
+                              "for 180 days in weeks."))
+    parser.add_argument("--window",
+                        default='week', choices=zanata_windows.WINDOWS,
+                        help=("Window size used with --window-store. "
+                              "Default: week"))
+    parser.add_argument("--bucket",
+                        choices=zanata_windows.WINDOWS,
+                        help=("Split the date range into weekly or monthly "
+                              "buckets, retrieve them concurrently and "
+                              "write stats per user and bucket. Rows get "
+                              "start_date and end_date columns, and with "
+                              "--format sqlite each bucket becomes a run."))
+    parser.add_argument("--resume",
+                        action='store_true',
+                        help=("Resume an interrupted run from its journal. "
+                              "Only work not recorded in the journal is "
+                              "retrieved."))
+    parser.add_argument("--journal",
+                        help=("Journal file recording completed work. "
+                              "It is removed when the stats are written. "
+                              "Default: <output file>.journal"))
+    parser.add_argument("--shard",
+                        type=_shard,
+                        help=("Only process the i-th of N shards of the "
+                              "(project, version, user) work, given as "
+                              "i/N, and write the stats into a shard file "
+                              "(Default: zanata_stats_output.shard-i-of-N"
+                              ".json). Run all shards, e.g. on different "
+                              "machines, and merge the shard files with "
+                              "the merge subcommand."))
+    parser.add_argument("--cube-file",
+                        help=("Also save stats per user, language, project "
+                              "and version into this numpy .npz file. "
+                              "Use zanata_cube.py to show rollups of it."))
+    parser.add_argument("--metrics-file",
+                        help=("Write request metrics (latency histograms, "
+                              "bytes, errors and retries per endpoint) into "
+                              "this JSON file at the end of the run."))
+    parser.add_argument("--profile",
+                        help=("Write cProfile stats of the run, including "
+                              "the work done by the --jobs threads, into "
+                              "this file."))
+    parser.add_argument("--cache-dir",
+                        help=("Cache Zanata responses in this directory "
+                              "and reuse them in later runs. "
+                              "By default, responses are not cached."))
+    parser.add_argument("--cache-ttl",
+                        type=int, default=zanata_cache.DEFAULT_TTL,
+                        help=("Seconds until a cached response expires. "
+                              "Stats for a date range which has already "
+                              "ended never expire. "
+                              "Default: %d" % zanata_cache.DEFAULT_TTL))
+    parser.add_argument("--cache-size",
+                        type=int,
+                        default=zanata_cache.DEFAULT_MAX_SIZE // 2 ** 20,
+                        help=("Maximum cache size in MB. Least recently "
+                              "used responses are evicted beyond it. "
+                              "Default: %d" %
+                              (zanata_cache.DEFAULT_MAX_SIZE // 2 ** 20)))
     parser.add_argument("user_yaml",
                         help="YAML file of the user list")
     options = parser.parse_args()
 
     language_teams = read_language_team_yaml(options.user_yaml, options.lang)
 
-    users = get_zanata_stats(options.start_date, options.end_date,
-                             language_teams, options.project)
+    client = zanata_client.configure(
+        max_connections=options.max_connections or options.jobs,
+        rate=options.rate,
+        adaptive=options.adaptive_rate,
+        max_retries=options.max_retries)
+
+    cache = None
+    if options.cache_dir:
+        cache = zanata_cache.ResponseCache(
+            options.cache_dir, ttl=options.cache_ttl,
+            max_size=options.cache_size * 2 ** 20)
+
+    window_store = None
+    if options.window_store:
+        window_store = zanata_windows.WindowStore(options.window_store)
+
+    if options.shard and options.cube_file:
+        print('--cube-file cannot be used with --shard.')
+        sys.exit(1)
+    if options.shard and options.bucket:
+        print('--bucket cannot be used with --shard.')
+        sys.exit(1)
+    if options.shard:
+        output_file = (options.output_file or
+                       'zanata_stats_output.shard-%d-of-%d.json'
+                       % options.shard)
+    else:
+        output_file = (options.output_file or
+                       'zanata_stats_output.%s' % options.format)
+
+    journal_params = {'start_date': options.start_date,
+                      'end_date': options.end_date,
+                      'project': options.project,
+                      'lang': options.lang,
+                      'window': options.window if window_store else None}
+    if options.bucket:
+        journal_params['bucket'] = options.bucket
+    if options.shard:
+        journal_params['shard'] = list(options.shard)
+    try:
+        journal = zanata_journal.Journal(
+            options.journal or '%s.journal' % output_file,
+            journal_params, resume=options.resume)
+    except zanata_journal.JournalMismatch as e:
+        print(e)
+        sys.exit(1)
+
+    cube = None
+    if options.cube_file:
+        # numpy is only needed for the stats cube.
+        import zanata_cube
+        cube = zanata_cube.StatsCube()
+
+    history = None
+    bucket_history = None
+    if options.shard:
+        # The units of the shard are written into the shard file, so
+        # that a run merged into a history database keeps them.
+        import zanata_history
+        history = zanata_history.Run(options.start_date, options.end_date,
+                                     journal_params)
+    elif options.format == HISTORY_FORMAT:
+        # sqlite3 is only needed for the history database.
+        import zanata_history
+        if options.bucket:
+            # Each bucket becomes a run of its own.
+            bucket_history = collections.OrderedDict(
+                (date_range,
+                 zanata_history.Run(date_range[0], date_range[1],
+                                    journal_params, language_teams))
+                for date_range in zanata_windows.split_date_range(
+                    options.start_date, options.end_date, options.bucket))
+        else:
+            history = zanata_history.Run(options.start_date,
+                                         options.end_date, journal_params,
+                                         language_teams)
 
-    output_file = (options.output_file or
-                   'zanata_stats_output.%s' % options.format)
+    profiler = None
+    if options.profile:
+        profiler = zanata_metrics.Profiler()
+        profiler.enable()
 
-    write_stats_to_file(users, output_file, options.format,
-                        options.include_no_activities)
+    series = collections.OrderedDict()
+    users = get_zanata_stats(options.start_date, options.end_date,
+                             language_teams, options.project,
+                             jobs=options.jobs, cache=cache,
+                             bulk=options.bulk, window_store=window_store,
+                             window=options.window, journal=journal,
+                             cube=cube, shard=options.shard,
+                             history=history, bucket=options.bucket,
+                             series=series, bucket_history=bucket_history,
+                             profiler=profiler)
+
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(options.profile)
+    if options.metrics_file:
+        client.metrics.write(options.metrics_file)
+
+    if options.shard:
+        shard_params = dict(journal_params)
+        del shard_params['shard']
+        write_shard_file(users, output_file, options.shard, shard_params,
+                         history.units)
+    elif options.bucket:
+        write_series_to_file(series, output_file, options.format,
+                             options.include_no_activities,
+                             runs=bucket_history)
+    else:
+        write_stats_to_file(users, output_file, options.format,
+                            options.include_no_activities, run=history)
+    if cube is not None:
+        cube.save(options.cube_file)
+        print('Stats cube has been written to %s' % options.cube_file)
+    journal.close(remove=True)
 
 
 if __name__ == '__main__':
@@ -15,38 +15,101 @@
 
 import argparse
 from collections import OrderedDict
-import random
+import copy
+import io
+import json
+from multiprocessing import pool
+import os
+import threading
 
 import bs4
-import requests
 import yaml
 
+import zanata_client
+
 base_url = "https://translate.openstack.org/%s"
 
+try:
+    import lxml  # noqa
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Only the list of languages or members is used from the Zanata pages,
+# so the rest of the page is not built into the tree at all.
+LIST_STRAINER = bs4.SoupStrainer('ul', {'class': 'list--stats'})
+
+
+class PageCache(object):
+    """Parsed Zanata pages with their HTTP validators.
+
+    Pages are requested with If-None-Match and If-Modified-Since, and
+    the parsed content is reused when Zanata answers 304 Not Modified.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.pages = {}
+        if os.path.exists(path):
+            with io.open(path, 'r', encoding='utf-8') as f:
+                self.pages = json.load(f)
+
+    def get(self, uri):
+        with self._lock:
+            return self.pages.get(uri)
+
+    def put(self, uri, validators, content):
+        with self._lock:
+            self.pages[uri] = dict(validators, content=content)
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.pages, sort_keys=True)
+        with io.open(self.path, 'w', encoding='utf-8') as f:
+            f.write(data if isinstance(data, type(u'')) else
+                    data.decode('utf-8'))
+
 
 class ZanataUtility(object):
     """Utilities to collect Zanata language contributors"""
-    user_agents = [
-        'Mozilla/5.0 (X11; Ubuntu; Linux x86_64) Gecko/20100101 Firefox/32.0',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_6) AppleWebKit/537.78.2',
-        'Mozilla/5.0 (Windows NT 6.3; WOW64) Gecko/20100101 Firefox/32.0',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X) Chrome/37.0.2062.120',
-        'Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; rv:11.0) like Gecko'
-    ]
+
+    def __init__(self, client=None, page_cache=None):
+        self.client = client or zanata_client.get_client()
+        self.page_cache = page_cache
 
     def read_uri(self, uri):
-        headers = {
-            'User-Agent': random.choice(ZanataUtility.user_agents)
-        }
-        req = requests.get(url=uri, headers=headers)
-        return req.text
+        return self.client.get(uri).text
 
-    def iter_language_members(self, uri):
-        data = self.read_uri(base_url % uri)
-        soup = bs4.BeautifulSoup(data, 'html.parser')
+    def read_page(self, uri, parse):
+        """Return parse() of the page at uri, skipping unchanged pages."""
+        if not self.page_cache:
+            return parse(self.read_uri(uri))
+        cached = self.page_cache.get(uri)
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        resp = self.client.get(uri, headers)
+        if resp.status_code == 304 and cached:
+            return copy.deepcopy(cached['content'])
+        content = parse(resp.text)
+        self.page_cache.put(uri, {'etag': resp.headers.get('ETag'),
+                                  'last_modified':
+                                  resp.headers.get('Last-Modified')},
+                            content)
+        return copy.deepcopy(content)
+
+    def _parse_list(self, data):
+        return bs4.BeautifulSoup(data, HTML_PARSER, parse_only=LIST_STRAINER)
+
+    def _parse_members(self, data):
+        soup = self._parse_list(data)
         users = soup.find('ul', {'class': 'list--stats'}) \
             .findAll('li', {'class': 'l--pad-all-quarter'})
 
+        members = []
         for user in users:
             span_txt = user.find('span', {'class': 'list__item__meta'}).text
             user_id = span_txt.lstrip().rstrip()
@@ -59,11 +122,16 @@ class ZanataUtility(object):
                 role_status = role.find('i')['class'][1]
                 if role_status != 'i--checkmark':
                     continue
-                yield role_name, user_id
+                members.append([role_name, user_id])
+        return members
 
-    def get_languages(self):
-        data = self.read_uri(base_url % 'language/list')
-        soup = bs4.BeautifulSoup(data, 'html.parser')
+    def iter_language_members(self, uri):
+        for role_name, user_id in self.read_page(base_url % uri,
+                                                 self._parse_members):
+            yield role_name, user_id
+
+    def _parse_languages(self, data):
+        soup = self._parse_list(data)
         languages = {}
         ul = soup.find('ul', {'class': 'list--stats'}).findAll('li')
         for li in ul:
@@ -86,16 +154,76 @@ class ZanataUtility(object):
             }
         return languages
 
+    def get_languages(self):
+        return self.read_page(base_url % 'language/list',
+                              self._parse_languages)
+
+
+def _dump_language(language_code, team_info):
+    # encoding=None makes safe_dump return unicode on Python 2 as well.
+    return yaml.safe_dump({language_code: team_info}, allow_unicode=True,
+                          encoding=None, indent=4, default_flow_style=False)
+
 
 def save_to_yaml(data, output_file):
-    with open(output_file, 'w') as out:
-        out.write("# Use the order of Zanata language team info.\n")
-        out.write("# Do not use the alphabetical order to make the "
-                  "maitenance easier.\n")
+    with io.open(output_file, 'w', encoding='utf-8') as out:
+        out.write(u"# Use the order of Zanata language team info.\n")
+        out.write(u"# Do not use the alphabetical order to make the "
+                  u"maitenance easier.\n")
 
         for (k, v) in data.items():
-            yaml.safe_dump({k: v}, out, allow_unicode=True, indent=4,
-                           encoding='utf-8', default_flow_style=False)
+            out.write(_dump_language(k, v))
+
+
+def _normalize_team(team_info):
+    # Zanata IDs consisting only of numbers are loaded as integers.
+    return dict((key, [str(i) for i in value] if isinstance(value, list)
+                 else value)
+                for key, value in (team_info or {}).items())
+
+
+def update_yaml(data, output_file):
+    """Update only the language blocks of output_file which changed.
+
+    Blocks of unchanged languages are kept as they are and in their
+    current order. New languages are appended and languages which no
+    longer exist are dropped. Returns the list of updated languages.
+    """
+    if not os.path.exists(output_file):
+        save_to_yaml(data, output_file)
+        return list(data)
+
+    with io.open(output_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    lines = text.splitlines(True)
+    root = yaml.compose(text)
+    keys = [key_node for key_node, value_node in root.value] if root else []
+    starts = [key_node.start_mark.line for key_node in keys]
+    header = lines[:starts[0]] if starts else lines
+    blocks = OrderedDict()
+    for i, key_node in enumerate(keys):
+        end = starts[i + 1] if i + 1 < len(starts) else len(lines)
+        blocks[key_node.value] = u''.join(lines[starts[i]:end])
+
+    updated = []
+    output = list(header)
+    for language_code in list(blocks) + [k for k in data
+                                         if k not in blocks]:
+        if language_code not in data:
+            updated.append(language_code)
+            continue
+        block = blocks.get(language_code)
+        current = (yaml.safe_load(block)[language_code]
+                   if block else None)
+        if _normalize_team(current) != _normalize_team(data[language_code]):
+            block = _dump_language(language_code, data[language_code])
+            updated.append(language_code)
+        output.append(block)
+
+    if updated:
+        with io.open(output_file, 'w', encoding='utf-8') as out:
+            out.write(u''.join(output))
+    return updated
 
 
 def convert_role_name(role):
@@ -107,16 +235,28 @@ def convert_role_name(role):
     return roles[role] if role in roles else None
 
 
-def collect_zanata_language_and_members():
-    zanata = ZanataUtility()
+def collect_zanata_language_and_members(jobs=1, page_cache=None):
+    zanata = ZanataUtility(page_cache=page_cache)
 
     print("Retreiving language list")
     languages = zanata.get_languages()
 
-    for language in languages.keys():
+    def get_members(language):
         print("Getting member list from language %s" % language)
         member_url = languages[language].pop('member_url')
-        for role, user_id in zanata.iter_language_members(member_url):
+        return language, list(zanata.iter_language_members(member_url))
+
+    if jobs > 1:
+        workers = pool.ThreadPool(jobs)
+        # imap keeps the order of languages, so the result is the same
+        # as fetching member pages one by one.
+        members = workers.imap(get_members, list(languages.keys()))
+    else:
+        workers = None
+        members = (get_members(language) for language in languages.keys())
+
+    for language, language_members in members:
+        for role, user_id in language_members:
             role = convert_role_name(role)
             if role is None:
                 print('[Warn] Unknown role : %s' % role)
@@ -126,6 +266,10 @@ def collect_zanata_language_and_members():
                 languages[language][role] = list()
             languages[language][role].append(user_id)
 
+    if workers:
+        workers.close()
+        workers.join()
+
     sorted_key = sorted(languages, reverse=True,
                         key=lambda k: len(languages[k]['translators']))
     result = OrderedDict((k, languages[k]) for k in sorted_key)
@@ -138,9 +282,32 @@ if __name__ == '__main__':
                         default="translation_team.yaml",
                         help=("Specify the output file. "
                               "Default: translation_team.yaml"))
+    parser.add_argument("--refresh",
+                        action='store_true',
+                        help=("Skip language pages unchanged since the "
+                              "last refresh and update only the changed "
+                              "languages in the existing output file, "
+                              "keeping its order."))
+    parser.add_argument("--page-cache",
+                        help=("Cache of Zanata pages used by --refresh. "
+                              "Default: <output file>.cache"))
+    parser.add_argument("-j", "--jobs",
+                        type=int, default=8,
+                        help=("Number of language member pages fetched "
+                              "concurrently. Default: 8"))
     options = parser.parse_args()
 
+    zanata_client.configure(max_connections=options.jobs)
     output_file = options.output_file
-    data = collect_zanata_language_and_members()
-    save_to_yaml(data, output_file)
+    if options.refresh:
+        page_cache = PageCache(options.page_cache or
+                               '%s.cache' % output_file)
+        data = collect_zanata_language_and_members(jobs=options.jobs,
+                                                   page_cache=page_cache)
+        updated = update_yaml(data, output_file)
+        page_cache.save()
+        print("updated languages: %s" % (', '.join(updated) or 'none'))
+    else:
+        data = collect_zanata_language_and_members(jobs=options.jobs)
+        save_to_yaml(data, output_file)
     print("output is saved to filename: %s" % output_file)
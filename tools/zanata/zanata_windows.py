@@ -0,0 +1,141 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import io
+import json
+import os
+import threading
+
+DATE_FORMAT = '%Y-%m-%d'
+WINDOWS = ['week', 'month']
+
+
+def _parse_date(date):
+    return datetime.datetime.strptime(date, DATE_FORMAT).date()
+
+
+def _format_date(date):
+    return date.strftime(DATE_FORMAT)
+
+
+def _next_window_start(date, window):
+    if window == 'week':
+        return date + datetime.timedelta(days=7 - date.weekday())
+    elif window == 'month':
+        if date.month == 12:
+            return datetime.date(date.year + 1, 1, 1)
+        return datetime.date(date.year, date.month + 1, 1)
+    raise ValueError('Unknown window: %s' % window)
+
+
+def split_date_range(start_date, end_date, window='week'):
+    """Split an inclusive date range into calendar windows.
+
+    Weeks start on Monday. The first and the last windows are clipped
+    to the given range, so the returned (start, end) pairs cover
+    exactly start_date..end_date without overlapping.
+    """
+    start = _parse_date(start_date)
+    end = _parse_date(end_date)
+    ranges = []
+    while start <= end:
+        next_start = _next_window_start(start, window)
+        window_end = min(next_start - datetime.timedelta(days=1), end)
+        ranges.append((_format_date(start), _format_date(window_end)))
+        start = next_start
+    return ranges
+
+
+def is_whole_window(date_range, window='week'):
+    """Return True if a (start, end) range is a whole calendar window.
+
+    The first and the last ranges returned by split_date_range are
+    usually clipped, and a clipped range moves with the start or the
+    end date of the run.
+    """
+    start = _parse_date(date_range[0])
+    window_start = _next_window_start(start - datetime.timedelta(days=1),
+                                      window)
+    window_end = _next_window_start(start, window) - datetime.timedelta(days=1)
+    return (start == window_start and
+            _format_date(window_end) == date_range[1])
+
+
+def is_closed_range(end_date):
+    """Return True if stats for a range ending at end_date are final."""
+    return end_date < _format_date(datetime.date.today())
+
+
+class WindowStore(object):
+    """Local store of contributor stats per closed date window.
+
+    Stats of each window are kept in an append-only JSON Lines file
+    named after the window, one line per (project, version, user).
+    Only windows which have already ended are stored since stats of
+    an open window can still change. Callers store only whole calendar
+    windows (see is_whole_window): a window clipped to the start date
+    of a rolling range gets a different key every day and would never
+    be reused.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self._windows = {}
+        self._lock = threading.Lock()
+        if not os.path.isdir(store_dir):
+            os.makedirs(store_dir)
+
+    def _path(self, date_range):
+        return os.path.join(self.store_dir, '%s..%s.jsonl' % date_range)
+
+    def _load(self, date_range):
+        # Caller must hold self._lock.
+        if date_range in self._windows:
+            return self._windows[date_range]
+        entries = {}
+        path = self._path(date_range)
+        if os.path.exists(path):
+            with io.open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line truncated by an interrupted run.
+                        continue
+                    key = (entry['project'], entry['version'],
+                           entry['user'])
+                    entries[key] = entry['stats']
+        self._windows[date_range] = entries
+        return entries
+
+    def get(self, unit, date_range):
+        """Return stored stats of a (project, version, user) unit.
+
+        None is returned if the unit is not stored for the window.
+        """
+        with self._lock:
+            return self._load(date_range).get(tuple(unit))
+
+    def put(self, unit, date_range, stats):
+        """Record stats of a unit if the window has already ended."""
+        if stats is None or not is_closed_range(date_range[1]):
+            return
+        project_id, version, user_id = unit
+        line = json.dumps({'project': project_id, 'version': version,
+                           'user': user_id, 'stats': stats})
+        with self._lock:
+            self._load(date_range)[tuple(unit)] = stats
+            with io.open(self._path(date_range), 'a',
+                         encoding='utf-8') as f:
+                f.write(u'%s\n' % line)